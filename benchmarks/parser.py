@@ -0,0 +1,90 @@
+
+"""Benchmark for the Lisp parser on large, machine-generated input.
+
+Generates an input file resembling a long game log (a configuration
+block, a board, some objects, and many commands, with comments and
+string literals mixed in), then reports how long parse_many takes to
+read it.
+
+Usage:
+
+    python3 benchmarks/parser.py [--megabytes N] [--repeat N]
+
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from blindman.lisp import parse_many  # noqa: E402
+
+PLAYER_COUNT = 60
+SPACE_COUNT = 40
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-m', '--megabytes', type=float, default=4.0, help='Approximate input size (default 4)')
+    parser.add_argument('-n', '--repeat', type=int, default=3, help='Number of timed runs (default 3)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the generated input')
+    return parser.parse_args()
+
+
+def generate_input(target_bytes: int, seed: int) -> str:
+    """Generates a syntactically valid input file of roughly
+    target_bytes characters."""
+    rng = random.Random(seed)
+    players = [f"player-{i}" for i in range(PLAYER_COUNT)]
+    spaces = [f"space-{i}" for i in range(SPACE_COUNT)]
+
+    header = [
+        '(configuration :background-image "Background.png" :fps 60 :start-space space-0)',
+        '(spaces ' + ' '.join(f"({space} ({rng.randrange(1000)} {rng.randrange(1000)}))" for space in spaces) + ')',
+        '(objects ' + ' '.join(f'(object {player} "{player}.png" space-0)' for player in players) + ')',
+        '(commands',
+    ]
+    parts = ['\n'.join(header)]
+    size = len(parts[0])
+    round_number = 0
+    while size < target_bytes:
+        command = rng.choice((
+            lambda: f"  (move {rng.choice(players)} {rng.choice(spaces)})",
+            lambda: f"  (swap {rng.choice(players)} {rng.choice(players)})",
+            lambda: f"  (shuffle ({rng.choice(players)} {rng.choice(players)}) ({rng.choice(players)} "
+                    f"{rng.choice(players)}))",
+            lambda: f'  (text "{rng.choice(players)} rolled a {rng.randrange(1, 7)}!\\nThe crowd \\"cheers\\".")',
+            lambda: "  (hide-text)",
+            lambda: f"  (wait {rng.randrange(10, 120)})",
+            lambda: f"  ; Round {round_number}, generated comment",
+        ))()
+        round_number += 1
+        parts.append(command)
+        size += len(command) + 1
+    parts.append(')')
+    return '\n'.join(parts)
+
+
+def main() -> None:
+    args = parse_args()
+    text = generate_input(int(args.megabytes * 1024 * 1024), args.seed)
+    megabytes = len(text.encode('utf-8')) / (1024 * 1024)
+
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        result = parse_many(text)
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+
+    print(f"input size:   {megabytes:.2f} MB ({len(result[3]) - 1} commands)")
+    print(f"parse_many:   best {best:.3f} s, median {statistics.median(timings):.3f} s")
+    print(f"throughput:   {megabytes / best:.2f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+
+"""Startup-time benchmark for the CLI and the blindman packages.
+
+Each measurement runs in a fresh interpreter, since import time is
+only paid once per process. For every module listed below, this
+reports the cumulative import time (as measured by `python -X
+importtime`) of importing that module on its own, along with which
+heavy third-party dependencies it dragged in. It also reports the
+wall-clock time of `main.py --help`.
+
+Usage:
+
+    python3 benchmarks/startup.py [--repeat N]
+
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = (
+    'blindman.util',
+    'blindman.lisp',
+    'blindman.renderer',
+    'blindman.discord',
+    'blindman.game',
+    'blindman.game.input',
+    'blindman.game.command',
+    'blindman.game.image',
+    'blindman.discord.cache',
+    'blindman.renderer.video',
+)
+
+HEAVY_DEPENDENCIES = ('numpy', 'cv2', 'imageio', 'cattrs', 'requests', 'redis')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--repeat', type=int, default=5, help='Number of runs per measurement (default 5)')
+    return parser.parse_args()
+
+
+def measure_import(module: str) -> tuple[float, set[str]]:
+    """Returns the cumulative import time of the module, in
+    milliseconds, and the heavy dependencies loaded along with it."""
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative_us = 0
+    loaded = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line.split('|')
+        name = name.strip()
+        if name.split('.')[0] in HEAVY_DEPENDENCIES:
+            loaded.add(name.split('.')[0])
+        if name == module:
+            cumulative_us = int(cumulative)
+    return cumulative_us / 1000, loaded
+
+
+def measure_help() -> float:
+    """Returns the wall-clock time of `main.py --help`, in
+    milliseconds."""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, 'main.py', '--help'],
+        cwd=REPO_ROOT,
+        stdout=subprocess.DEVNULL,
+        check=True,
+    )
+    return (time.perf_counter() - start) * 1000
+
+
+def measure_help_baseline() -> float:
+    """Returns the wall-clock time of starting a bare interpreter, in
+    milliseconds, for comparison with measure_help."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'pass'], check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def main() -> None:
+    args = parse_args()
+
+    print(f"{'module':<28} {'import (ms)':>12}  heavy dependencies")
+    for module in MODULES:
+        timings = []
+        loaded: set[str] = set()
+        for _ in range(args.repeat):
+            ms, loaded = measure_import(module)
+            timings.append(ms)
+        print(f"{module:<28} {statistics.median(timings):>12.1f}  {', '.join(sorted(loaded)) or '-'}")
+
+    baseline = statistics.median(measure_help_baseline() for _ in range(args.repeat))
+    help_time = statistics.median(measure_help() for _ in range(args.repeat))
+    print()
+    print(f"{'interpreter startup':<28} {baseline:>12.1f}")
+    print(f"{'main.py --help':<28} {help_time:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
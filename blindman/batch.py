@@ -0,0 +1,216 @@
+
+"""Batch mode: rendering many input files in one go.
+
+Run it with
+
+    python3 -m blindman.batch <inputs...> -o <output-dir> [--workers N]
+
+Each input may be a file name or a glob pattern (such as
+"games/*.lisp"), and --list names a file listing more inputs, one per
+line. Every input is rendered to <output-dir>/<name>.<format>.
+
+Before any rendering starts, every input file is read once, in this
+process, to collect the images it uses. All referenced Discord
+avatars are then fetched in one batch, and every local image is
+decoded once into the decoded-image cache. The worker processes then
+share those results through the on-disk caches (and Redis, if
+present), rather than each looking them up again.
+
+A file which fails to parse or render is reported in the summary, and
+does not stop the other files from rendering. The summary is printed,
+and also written as JSON to <output-dir>/summary.json (or the file
+named by --summary).
+
+"""
+
+from __future__ import annotations
+
+from blindman.game.command import ChangeBackgroundCommand
+from blindman.game.image import DISCORD_PREFIX, NO_IMAGE_CACHE_FLAG, preload_images, resolve_image_path
+from blindman.game.input import InputFile
+from blindman.worker import JobFailed, new_pool, render_job
+
+import argparse
+import concurrent.futures
+import glob
+import json
+import logging
+import os
+from pathlib import Path
+import sys
+import time
+from typing import Any, Iterator
+
+logger = logging.getLogger(__name__)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog='python3 -m blindman.batch')
+    parser.add_argument('inputs', nargs='*', type=str, help='Input .lisp files, or glob patterns matching them')
+    parser.add_argument('-l', '--list', type=str, default=None,
+                        help='A file listing further inputs, one per line ("-" for standard input)')
+    parser.add_argument('-o', '--output-dir', required=True, type=str, help='The directory to write videos to')
+    parser.add_argument('-f', '--format', type=str, default='mp4', help='The output file extension (default mp4)')
+    parser.add_argument('-w', '--workers', type=int, default=max(os.cpu_count() or 1, 1),
+                        help='Number of worker processes (default: one per CPU)')
+    parser.add_argument('--summary', type=str, default=None,
+                        help='Where to write the JSON summary (default: summary.json in the output directory)')
+    return parser.parse_args()
+
+
+def expand_inputs(patterns: list[str]) -> list[str]:
+    """Expands glob patterns, returning the absolute path of every
+    matching file, without duplicates. Patterns without wildcards are
+    returned as-is, even if they do not exist, so that they are
+    reported as failures."""
+    inputs = []
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            inputs.extend(sorted(glob.glob(pattern, recursive=True)))
+        else:
+            inputs.append(pattern)
+    return list(dict.fromkeys(os.path.abspath(path) for path in inputs))
+
+
+def output_paths(inputs: list[str], output_dir: str, output_format: str) -> dict[str, str]:
+    """Maps each input to its output path. Raises ValueError if two
+    inputs would be written to the same output."""
+    outputs: dict[str, str] = {}
+    for input_path in inputs:
+        output_path = os.path.join(os.path.abspath(output_dir), f"{Path(input_path).stem}.{output_format}")
+        if output_path in outputs.values():
+            raise ValueError(f"More than one input would be written to {output_path}")
+        outputs[input_path] = output_path
+    return outputs
+
+
+def preload(inputs: list[str]) -> dict[str, str]:
+    """Reads every input file, fetches every Discord avatar they
+    reference in one batch, and decodes every local image they
+    reference into the decoded-image cache (as RGB for backgrounds,
+    as the workers load them). Returns an error message
+    for each input which could not be read."""
+    failures: dict[str, str] = {}
+    discord_paths: list[str] = []
+    local_paths: list[tuple[str, bool]] = []  # (path, rgb)
+    for input_path in inputs:
+        try:
+            input_file = InputFile.read_file(input_path)
+        except Exception as e:
+            failures[input_path] = f"{type(e).__name__}: {e}"
+            continue
+        for path, rgb in _image_variants(input_file):
+            if path.startswith(DISCORD_PREFIX):
+                discord_paths.append(path)
+            else:
+                local_paths.append((os.path.join(os.path.dirname(input_path), path), rgb))
+
+    # Failures here are only logged: they will recur, and be reported
+    # against the right file, when the affected files are rendered.
+    try:
+        preload_images(dict.fromkeys(discord_paths))
+    except Exception as e:
+        logger.warning(f"Could not prefetch Discord avatars: {e}")
+    if not os.environ.get(NO_IMAGE_CACHE_FLAG):
+        for path, rgb in dict.fromkeys((os.path.realpath(path), rgb) for path, rgb in local_paths):
+            try:
+                resolve_image_path(path, allow_discord=False, rgb=rgb)
+            except Exception as e:
+                logger.warning(f"Could not decode {path}: {e}")
+    return failures
+
+
+def _image_variants(input_file: InputFile) -> Iterator[tuple[str, bool]]:
+    """Yields every image path referenced by the input file, along
+    with whether it is loaded as RGB (as backgrounds are) rather than
+    RGBA. An image used both ways is yielded once for each."""
+    yield input_file.config.background_image, True
+    for obj in input_file.objects:
+        yield obj.image_path, False
+    for command in input_file.commands:
+        rgb = isinstance(command, ChangeBackgroundCommand)
+        for path in command.image_paths():
+            yield path, rgb
+
+
+def render_all(inputs: list[str], outputs: dict[str, str], workers: int) -> list[dict[str, Any]]:
+    """Renders every input on a pool of workers, returning a summary
+    entry for each one."""
+    start = time.perf_counter()
+    results: dict[str, dict[str, Any]] = {}
+    for input_path, error in preload(inputs).items():
+        results[input_path] = {'error': error}
+    logger.info(f"Read {len(inputs)} input files in {time.perf_counter() - start:.2f} s")
+
+    with new_pool(workers) as pool:
+        futures = {
+            pool.submit(render_job, input_path, outputs[input_path], os.path.dirname(input_path)): input_path
+            for input_path in inputs
+            if input_path not in results
+        }
+        for future in concurrent.futures.as_completed(futures):
+            input_path = futures[future]
+            try:
+                results[input_path] = future.result()
+            except JobFailed as e:
+                results[input_path] = {'error': str(e)}
+            except Exception as e:
+                results[input_path] = {'error': f"{type(e).__name__}: {e}"}
+            state = 'failed' if 'error' in results[input_path] else 'done'
+            logger.info(f"[{len(results)}/{len(inputs)}] {state}: {input_path}")
+
+    summary = []
+    for input_path in inputs:
+        result = results[input_path]
+        summary.append({
+            'input': input_path,
+            'output': outputs[input_path],
+            'state': 'failed' if 'error' in result else 'done',
+            'compile_seconds': result.get('compile_seconds'),
+            'render_seconds': result.get('render_seconds'),
+            'total_frames': result.get('total_frames'),
+            'error': result.get('error'),
+        })
+    return summary
+
+
+def print_summary(summary: list[dict[str, Any]]) -> None:
+    width = max((len(entry['input']) for entry in summary), default=0)
+    for entry in summary:
+        if entry['state'] == 'done':
+            timing = f"compile {entry['compile_seconds']:7.2f} s  render {entry['render_seconds']:7.2f} s"
+            print(f"{entry['input']:<{width}}  {timing}")
+        else:
+            print(f"{entry['input']:<{width}}  FAILED: {entry['error']}")
+    failed = sum(1 for entry in summary if entry['state'] == 'failed')
+    print(f"{len(summary) - failed} rendered, {failed} failed")
+
+
+def main() -> None:
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    patterns = list(args.inputs)
+    if args.list is not None:
+        with (sys.stdin if args.list == '-' else open(args.list)) as list_file:
+            patterns.extend(line.strip() for line in list_file if line.strip())
+    inputs = expand_inputs(patterns)
+    if not inputs:
+        sys.exit("No input files")
+    try:
+        outputs = output_paths(inputs, args.output_dir, args.format)
+    except ValueError as e:
+        sys.exit(str(e))
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    summary = render_all(inputs, outputs, args.workers)
+    print_summary(summary)
+    summary_path = args.summary or os.path.join(args.output_dir, 'summary.json')
+    with open(summary_path, 'w') as summary_file:
+        json.dump(summary, summary_file, indent=2)
+    if any(entry['state'] == 'failed' for entry in summary):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,13 +5,41 @@ of an environment variable called DISCORD_BOT_TOKEN.
 
 """
 
-from .config import get_bot_token, request_headers
-from .user import User
-from .cache import get_avatar
+from blindman.util.lazy import lazy_exports
 
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .config import get_bot_token, request_headers
+    from .client import DiscordClient, get_client
+    from .user import User
+    from .backend import CacheBackend, CacheEntry, MemoryBackend, DiskBackend, RedisBackend, TieredCache
+    from .cache import get_user, get_users, get_avatar, get_avatars, get_cache, configure_cache
 
 __all__ = (
     'get_bot_token', 'request_headers',
+    'DiscordClient', 'get_client',
     'User',
-    'get_avatar',
+    'CacheBackend', 'CacheEntry', 'MemoryBackend', 'DiskBackend', 'RedisBackend', 'TieredCache',
+    'get_user', 'get_users', 'get_avatar', 'get_avatars', 'get_cache', 'configure_cache',
 )
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    'get_bot_token': '.config',
+    'request_headers': '.config',
+    'DiscordClient': '.client',
+    'get_client': '.client',
+    'User': '.user',
+    'CacheBackend': '.backend',
+    'CacheEntry': '.backend',
+    'MemoryBackend': '.backend',
+    'DiskBackend': '.backend',
+    'RedisBackend': '.backend',
+    'TieredCache': '.backend',
+    'get_user': '.cache',
+    'get_users': '.cache',
+    'get_avatar': '.cache',
+    'get_avatars': '.cache',
+    'get_cache': '.cache',
+    'configure_cache': '.cache',
+})
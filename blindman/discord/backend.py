@@ -0,0 +1,390 @@
+
+"""Storage backends for the avatar cache.
+
+A CacheBackend is a simple byte-oriented key-value store. Several
+implementations are provided: an in-process LRU (MemoryBackend), a
+local directory on disk (DiskBackend), and a Redis server
+(RedisBackend). TieredCache layers several backends on top of each
+other, consulting faster tiers first.
+
+"""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+import hashlib
+import logging
+import os
+from pathlib import Path
+import struct
+import tempfile
+import threading
+import time
+from typing import Any, Iterable, NamedTuple, Sequence, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import redis
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MEMORY_ENTRIES = 1024
+DEFAULT_DISK_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_REDIS_TIMEOUT = 0.5  # seconds
+
+# Disk entries are prefixed with their expiry time, as a UNIX
+# timestamp. An expiry of zero means the entry never expires.
+_DISK_HEADER = struct.Struct(">d")
+
+
+class CacheEntry(NamedTuple):
+    """A value stored in a cache, together with the number of seconds
+    remaining before it expires (or None if it never expires)."""
+    value: bytes
+    ttl: float | None
+
+
+class CacheBackend(ABC):
+    """A key-value store mapping string keys to byte strings."""
+
+    @abstractmethod
+    def lookup(self, key: str) -> CacheEntry | None:
+        """Returns the entry stored at the key, or None if there is no
+        (unexpired) entry."""
+        ...
+
+    def get(self, key: str) -> bytes | None:
+        """Returns the value stored at the key, or None if there is no
+        (unexpired) value."""
+        entry = self.lookup(key)
+        return None if entry is None else entry.value
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, *, ttl: float | None = None) -> None:
+        """Stores the value at the key. If ttl is not None, the entry
+        expires after that many seconds."""
+        ...
+
+    def lookup_many(self, keys: Sequence[str]) -> list[CacheEntry | None]:
+        """Looks up several keys at once, returning a list parallel to
+        keys. Backends which can batch requests should override this
+        method; the default implementation calls lookup repeatedly."""
+        return [self.lookup(key) for key in keys]
+
+    def set_many(self, items: Iterable[tuple[str, bytes, float | None]]) -> None:
+        """Stores several (key, value, ttl) entries at once. Backends
+        which can batch requests should override this method; the
+        default implementation calls set repeatedly."""
+        for key, value, ttl in items:
+            self.set(key, value, ttl=ttl)
+
+
+class MemoryBackend(CacheBackend):
+    """An in-process, least-recently-used cache holding at most
+    max_entries values."""
+
+    def __init__(self, max_entries: int = DEFAULT_MEMORY_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[bytes, float | None]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, key: str) -> CacheEntry | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            ttl = None if expires_at is None else expires_at - time.monotonic()
+            if ttl is not None and ttl <= 0:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return CacheEntry(value, ttl)
+
+    def set(self, key: str, value: bytes, *, ttl: float | None = None) -> None:
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class DiskBackend(CacheBackend):
+    """A cache stored as one file per entry in a local directory.
+
+    Entries older than default_ttl seconds (if given) are treated as
+    missing and deleted when encountered. When the directory grows
+    beyond max_bytes, expired entries and then the least recently
+    used entries are evicted until it fits again.
+
+    """
+
+    def __init__(
+            self,
+            directory: str | os.PathLike,
+            *,
+            max_bytes: int = DEFAULT_DISK_MAX_BYTES,
+            default_ttl: float | None = None,
+    ) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._size: int | None = None  # Computed lazily
+        self._lock = threading.Lock()
+
+    def lookup(self, key: str) -> CacheEntry | None:
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None
+        if len(data) < _DISK_HEADER.size:
+            self._delete(path)
+            return None
+        (expires_at,) = _DISK_HEADER.unpack_from(data)
+        ttl = expires_at - time.time() if expires_at else None
+        if ttl is not None and ttl <= 0:
+            self._delete(path)
+            return None
+        try:
+            os.utime(path)  # Mark as recently used
+        except OSError:
+            pass
+        return CacheEntry(data[_DISK_HEADER.size:], ttl)
+
+    def set(self, key: str, value: bytes, *, ttl: float | None = None) -> None:
+        if ttl is None:
+            ttl = self.default_ttl
+        expires_at = 0.0 if ttl is None else time.time() + ttl
+        data = _DISK_HEADER.pack(expires_at) + value
+        path = self._path(key)
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with self._lock:
+                old_size = _file_size(path)
+                fd, tmp_name = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+                with os.fdopen(fd, 'wb') as tmp_file:
+                    tmp_file.write(data)
+                os.replace(tmp_name, path)
+                if self._size is not None:
+                    self._size += len(data) - old_size
+            self._enforce_limit()
+        except OSError as e:
+            logger.warning(f"Could not write to disk cache at {self.directory}: {e}")
+
+    def _path(self, key: str) -> Path:
+        return self.directory / (hashlib.sha256(key.encode('utf-8')).hexdigest() + '.bin')
+
+    def _delete(self, path: Path) -> None:
+        with self._lock:
+            size = _file_size(path)
+            try:
+                path.unlink()
+            except OSError:
+                return
+            if self._size is not None:
+                self._size -= size
+
+    def _enforce_limit(self) -> None:
+        with self._lock:
+            if self._size is None:
+                self._size = sum(_file_size(p) for p in self.directory.glob('*.bin'))
+            if self._size <= self.max_bytes:
+                return
+
+            now = time.time()
+            entries = []
+            for path in self.directory.glob('*.bin'):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue  # Deleted out from under us
+                try:
+                    with path.open('rb') as f:
+                        (expires_at,) = _DISK_HEADER.unpack(f.read(_DISK_HEADER.size))
+                except (OSError, struct.error):
+                    expires_at = now  # Unreadable, so evict it first
+                expired = bool(expires_at) and expires_at <= now
+                entries.append((not expired, stat.st_mtime, path, stat.st_size))
+
+            # Expired entries first, then oldest first.
+            entries.sort(key=lambda entry: entry[:2])
+            self._size = sum(entry[3] for entry in entries)
+            for _, _, path, size in entries:
+                if self._size <= self.max_bytes:
+                    break
+                try:
+                    path.unlink()
+                except OSError:
+                    continue
+                self._size -= size
+
+
+class RedisBackend(CacheBackend):
+    """A cache stored on a Redis server.
+
+    The connection is not established until the first cache access.
+    If the server cannot be reached (or stops responding within the
+    configured timeout), a warning is logged and the backend disables
+    itself for the rest of the process, behaving as an always-empty
+    cache.
+
+    """
+
+    def __init__(
+            self,
+            *,
+            host: str = 'localhost',
+            port: int = 6379,
+            db: int = 0,
+            prefix: str = 'blindman',
+            timeout: float = DEFAULT_REDIS_TIMEOUT,
+            max_connections: int = 8,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.db = db
+        self.prefix = prefix
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._client: redis.Redis | None = None
+        self._disabled = False
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        """False if a previous access failed and the backend has
+        disabled itself."""
+        return not self._disabled
+
+    def lookup(self, key: str) -> CacheEntry | None:
+        return self.lookup_many([key])[0]
+
+    def set(self, key: str, value: bytes, *, ttl: float | None = None) -> None:
+        self.set_many([(key, value, ttl)])
+
+    def lookup_many(self, keys: Sequence[str]) -> list[CacheEntry | None]:
+        """Looks up all of the keys in a single round-trip to the
+        server."""
+        client = self._connection()
+        if client is None or not keys:
+            return [None] * len(keys)
+        redis_keys = [self._key(key) for key in keys]
+        try:
+            pipeline = client.pipeline(transaction=False)
+            pipeline.mget(redis_keys)
+            for redis_key in redis_keys:
+                pipeline.pttl(redis_key)
+            values: Any  # Any: Redis type is wrong
+            values, *ttls_ms = pipeline.execute()
+        except _redis_error() as e:
+            self._disable(e)
+            return [None] * len(keys)
+        return [
+            None if value is None else CacheEntry(value, ttl_ms / 1000 if ttl_ms >= 0 else None)
+            for value, ttl_ms in zip(values, ttls_ms)
+        ]
+
+    def set_many(self, items: Iterable[tuple[str, bytes, float | None]]) -> None:
+        """Stores all of the entries in a single round-trip to the
+        server."""
+        items = list(items)
+        client = self._connection()
+        if client is None or not items:
+            return
+        try:
+            pipeline = client.pipeline(transaction=False)
+            for key, value, ttl in items:
+                pipeline.set(self._key(key), value, px=None if ttl is None else max(int(ttl * 1000), 1))
+            pipeline.execute()
+        except _redis_error() as e:
+            self._disable(e)
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    def _connection(self) -> redis.Redis | None:
+        with self._lock:
+            if self._disabled:
+                return None
+            if self._client is None:
+                # Imported here, so that nothing imports redis unless
+                # this tier is actually used.
+                import redis
+                pool = redis.ConnectionPool(
+                    host=self.host,
+                    port=self.port,
+                    db=self.db,
+                    socket_timeout=self.timeout,
+                    socket_connect_timeout=self.timeout,
+                    max_connections=self.max_connections,
+                )
+                self._client = redis.Redis(connection_pool=pool)
+            return self._client
+
+    def _disable(self, error: Exception) -> None:
+        with self._lock:
+            if self._disabled:
+                return
+            self._disabled = True
+            client, self._client = self._client, None
+        if client is not None:
+            client.connection_pool.disconnect()
+        logger.warning(f"Redis is not available ({error}). The Redis cache tier has been disabled.")
+
+
+def _redis_error() -> type[Exception]:
+    # Only called once a connection exists, so redis is already
+    # imported.
+    import redis
+    return redis.RedisError
+
+
+class TieredCache(CacheBackend):
+    """A cache made up of several backends, ordered from fastest to
+    slowest. Reads consult each tier in turn and copy any hit into the
+    faster tiers that missed it. Writes go to every tier."""
+
+    def __init__(self, tiers: Sequence[CacheBackend]) -> None:
+        self.tiers = tuple(tiers)
+
+    def lookup(self, key: str) -> CacheEntry | None:
+        for i, tier in enumerate(self.tiers):
+            entry = tier.lookup(key)
+            if entry is not None:
+                for faster_tier in self.tiers[:i]:
+                    faster_tier.set(key, entry.value, ttl=entry.ttl)
+                return entry
+        return None
+
+    def set(self, key: str, value: bytes, *, ttl: float | None = None) -> None:
+        for tier in self.tiers:
+            tier.set(key, value, ttl=ttl)
+
+    def lookup_many(self, keys: Sequence[str]) -> list[CacheEntry | None]:
+        results: list[CacheEntry | None] = [None] * len(keys)
+        missing = list(range(len(keys)))
+        for i, tier in enumerate(self.tiers):
+            if not missing:
+                break
+            entries = tier.lookup_many([keys[j] for j in missing])
+            hits = [(j, entry) for j, entry in zip(missing, entries) if entry is not None]
+            for faster_tier in self.tiers[:i]:
+                faster_tier.set_many((keys[j], entry.value, entry.ttl) for j, entry in hits)
+            for j, entry in hits:
+                results[j] = entry
+            missing = [j for j in missing if results[j] is None]
+        return results
+
+    def set_many(self, items: Iterable[tuple[str, bytes, float | None]]) -> None:
+        items = list(items)
+        for tier in self.tiers:
+            tier.set_many(items)
+
+
+def _file_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
@@ -2,53 +2,177 @@
 """Caching for user avatars, so we don't constantly ping Discord's
 server.
 
-This cache uses a local Redis data store which tracks avatars by their
-user and requested size parameter. If Redis is not running, then
-get_avatar is equivalent to simply querying the Discord API every time
-(that is, no caching is performed). In that case, loading this module
-will print a warning. The warning can be suppressed by setting the
-NO_REDIS environment variable.
+Avatar images never change for a given avatar hash, so they are
+cached permanently under the user ID, avatar hash, and requested
+size. The user metadata naming the current avatar hash is cached
+separately, with a short expiry, so that changed avatars are picked up
+promptly. A warm lookup therefore costs at most one user metadata
+request, and none at all while the metadata is still fresh.
+
+Entries are cached in up to three tiers, consulted in order: an
+in-process LRU, a local Redis data store, and a directory on the
+local disk. Nothing is contacted until the first avatar is requested.
+If Redis is not running, that tier logs a warning and disables
+itself, and the remaining tiers are still used. The Redis tier can be
+turned off entirely by setting the NO_REDIS environment variable, and
+the disk tier can be relocated with BLINDMAN_CACHE_DIR or turned off
+with NO_DISK_CACHE.
+
+For rendering many players at once, get_avatars looks up a whole
+batch of avatars with one round-trip per cache tier and fetches only
+the misses, concurrently.
+
+A different arrangement of tiers can be installed with
+configure_cache.
 
 """
 
 from .user import User
+from .client import get_client
+from .backend import CacheBackend, MemoryBackend, RedisBackend, DiskBackend, TieredCache
+import blindman.util as util
 
-import redis
+import cattrs
 
-import logging
+import json
 import os
-from typing import Any
-
-logger = logging.getLogger(__name__)
+import threading
+from typing import Iterable
 
 REDIS_KEY = "blindman"
 NO_REDIS_FLAG = 'NO_REDIS'
+NO_DISK_CACHE_FLAG = 'NO_DISK_CACHE'
 
+# How long to trust cached user metadata (and hence the user's avatar
+# hash) before asking Discord again.
+USER_METADATA_TTL = 10 * 60  # seconds
 
-_LOCAL_REDIS: redis.Redis | None
-_LOCAL_REDIS = redis.Redis()
 
-if not _LOCAL_REDIS.ping():
-    _LOCAL_REDIS = None
+_CACHE: CacheBackend | None = None
+_CACHE_LOCK = threading.Lock()
+
+
+def default_cache() -> CacheBackend:
+    """Builds the default tiered cache, as configured by the
+    environment. See the module documentation for details."""
+    tiers: list[CacheBackend] = [MemoryBackend()]
     if not os.environ.get(NO_REDIS_FLAG):
-        logger.warning("Redis is not running. No cache will be available.")
-        logger.warning(f"Install redis or set the environment variable {NO_REDIS_FLAG} to suppress this message.")
+        tiers.append(RedisBackend(prefix=REDIS_KEY))
+    if not os.environ.get(NO_DISK_CACHE_FLAG):
+        tiers.append(DiskBackend(util.cache_dir() / 'avatars'))
+    return TieredCache(tiers)
+
+
+def get_cache() -> CacheBackend:
+    """Returns the avatar cache, constructing the default cache on
+    first use if none has been configured."""
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = default_cache()
+        return _CACHE
+
+
+def configure_cache(cache: CacheBackend) -> None:
+    """Replaces the avatar cache used by get_avatar."""
+    global _CACHE
+    with _CACHE_LOCK:
+        _CACHE = cache
+
+
+def get_user(user_id: str) -> User:
+    """Returns the user with the given ID. Recently fetched users are
+    served from the cache; otherwise, this is equivalent to
+    User.get."""
+    cache = get_cache()
+    cache_key = _user_key(user_id)
+    cached_value = cache.get(cache_key)
+    if cached_value is not None:
+        return _decode_user(cached_value)
+
+    user = User.get(user_id)
+    cache.set(cache_key, _encode_user(user), ttl=USER_METADATA_TTL)
+    return user
 
 
 def get_avatar(user_id: str, size: int | None = None) -> bytes:
     """Returns the avatar for the given user in the given size. This
-    function uses a Redis cache if available but falls back to a
-    direct Discord API call if needed.
+    function uses the configured cache tiers if available but falls
+    back to a direct Discord API call if needed.
 
     """
-    cache_key = f"avatar:{user_id}?size={size}"
-    if _LOCAL_REDIS:
-        cached_value: Any = _LOCAL_REDIS.hget(REDIS_KEY, cache_key)  # Any: Redis type is wrong
-        if cached_value:
-            return cached_value
+    user = get_user(user_id)
+    cache = get_cache()
+    cache_key = _avatar_key(user.id, user.avatar, size)
+    cached_value = cache.get(cache_key)
+    if cached_value is not None:
+        return cached_value
 
-    user = User.get(user_id)
     avatar = user.get_avatar(size=size)
-    if _LOCAL_REDIS:
-        _LOCAL_REDIS.hset(REDIS_KEY, cache_key, avatar)  # type: ignore # Redis type is wrong
+    cache.set(cache_key, avatar)
     return avatar
+
+
+def get_users(user_ids: Iterable[str]) -> dict[str, User]:
+    """Returns the users with the given IDs, keyed by ID. Cached users
+    are looked up in one batch, and any misses are fetched from Discord
+    concurrently and written back in one batch."""
+    user_ids = list(dict.fromkeys(user_ids))
+    cache = get_cache()
+    entries = cache.lookup_many([_user_key(user_id) for user_id in user_ids])
+    users = {
+        user_id: _decode_user(entry.value)
+        for user_id, entry in zip(user_ids, entries)
+        if entry is not None
+    }
+
+    missing = [user_id for user_id in user_ids if user_id not in users]
+    fetched = {
+        user_id: cattrs.structure(data, User)
+        for user_id, data in get_client().get_users_data(missing).items()
+    }
+    cache.set_many(
+        (_user_key(user_id), _encode_user(user), USER_METADATA_TTL)
+        for user_id, user in fetched.items()
+    )
+    users.update(fetched)
+    return users
+
+
+def get_avatars(user_ids: Iterable[str], size: int | None = None) -> dict[str, bytes]:
+    """Returns the avatars for all of the given users in the given
+    size, keyed by user ID. This is equivalent to calling get_avatar
+    for each user, but it batches cache lookups and fetches misses
+    concurrently."""
+    users = get_users(user_ids)
+    cache = get_cache()
+    cache_keys = {user_id: _avatar_key(user.id, user.avatar, size) for user_id, user in users.items()}
+    entries = cache.lookup_many(list(cache_keys.values()))
+    avatars = {user_id: entry.value for user_id, entry in zip(cache_keys, entries) if entry is not None}
+
+    missing = [(user.id, user.avatar) for user_id, user in users.items() if user_id not in avatars]
+    fetched = get_client().get_avatar_images(missing, size=size)
+    cache.set_many(
+        (_avatar_key(user_id, avatar_hash, size), avatar, None)
+        for (user_id, avatar_hash), avatar in fetched.items()
+    )
+    for user_id, user in users.items():
+        if user_id not in avatars:
+            avatars[user_id] = fetched[(user.id, user.avatar)]
+    return avatars
+
+
+def _user_key(user_id: str) -> str:
+    return f"user:{user_id}"
+
+
+def _avatar_key(user_id: str, avatar_hash: str, size: int | None) -> str:
+    return f"avatar:{user_id}/{avatar_hash}?size={size}"
+
+
+def _encode_user(user: User) -> bytes:
+    return json.dumps(cattrs.unstructure(user)).encode('utf-8')
+
+
+def _decode_user(data: bytes) -> User:
+    return cattrs.structure(json.loads(data), User)
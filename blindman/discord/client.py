@@ -0,0 +1,250 @@
+
+"""HTTP client for the Discord API and CDN.
+
+All Discord traffic goes through a DiscordClient, which keeps a single
+pooled requests.Session alive (so that repeated requests reuse the
+same TCP/TLS connection), applies timeouts to every request, bounds
+the number of requests in flight at once, and backs off automatically
+when Discord reports that we are being rate limited. Rate limits are
+tracked per bucket, as Discord applies them, so that being limited on
+the CDN does not hold up API requests (or vice versa).
+
+Most callers should use get_client() to obtain the shared,
+process-wide client rather than constructing their own.
+
+"""
+
+from __future__ import annotations
+
+from .config import request_headers
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from typing import Any, Callable, Iterable, TypeVar
+from urllib.parse import urlsplit
+
+DISCORD_API_BASE = "https://discord.com/api/v10"
+DISCORD_CDN_BASE = "https://cdn.discordapp.com"
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_TIMEOUT = (5.0, 30.0)  # (connect, read), in seconds
+DEFAULT_MAX_RETRIES = 5
+
+# Upper bound on any single rate-limit sleep, in case Discord (or a
+# misbehaving proxy) hands us something absurd.
+MAX_BACKOFF_SECONDS = 60.0
+
+TOO_MANY_REQUESTS = 429
+
+_K = TypeVar("_K")
+_V = TypeVar("_V")
+
+
+class DiscordClient:
+    """A pooled, rate-limit-aware client for the parts of the Discord
+    API we need.
+
+    Requests are made on a shared keep-alive session. At most
+    max_concurrency requests are in flight at once, regardless of how
+    many threads use the client. When Discord responds with 429 Too
+    Many Requests, the client waits for the indicated retry_after and
+    tries again (up to max_retries times). When a response reports
+    that its rate-limit bucket is exhausted, subsequent requests in
+    that bucket wait for it to reset before being sent. A global rate
+    limit holds up every request to the same host.
+
+    """
+
+    def __init__(
+            self,
+            *,
+            api_base: str = DISCORD_API_BASE,
+            cdn_base: str = DISCORD_CDN_BASE,
+            max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+            timeout: float | tuple[float, float] = DEFAULT_TIMEOUT,
+            max_retries: int = DEFAULT_MAX_RETRIES,
+    ) -> None:
+        if max_concurrency < 1:
+            raise ValueError('max_concurrency must be at least one')
+        self.api_base = api_base.rstrip('/')
+        self.cdn_base = cdn_base.rstrip('/')
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max_concurrency)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._rate_limit_lock = threading.Lock()
+        # Maps each route (a host and a path template) to the key of
+        # the bucket Discord reported for it. Until a response reports
+        # one, a route is its own bucket.
+        self._route_buckets: dict[str, str] = {}
+        # Maps bucket keys, and hosts (for global limits), to
+        # time.monotonic() timestamps.
+        self._blocked_until: dict[str, float] = {}
+
+    def close(self) -> None:
+        """Closes the underlying session and its pooled connections."""
+        self._session.close()
+
+    def __enter__(self) -> DiscordClient:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def get_user_data(self, user_id: str) -> dict[str, Any]:
+        """Gets the raw JSON user object for the given user ID. Raises
+        requests.HTTPError if the user does not exist."""
+        resp = self._request(f"{self.api_base}/users/{user_id}", route='/users/{user_id}', headers=request_headers())
+        return resp.json()
+
+    def avatar_url(self, user_id: str, avatar_hash: str, size: int | None = None) -> str:
+        """Returns the CDN URL at which the given avatar can be
+        accessed."""
+        url = f"{self.cdn_base}/avatars/{user_id}/{avatar_hash}.png"
+        if size is not None:
+            url += f"?size={size}"
+        return url
+
+    def get_avatar_image(self, user_id: str, avatar_hash: str, size: int | None = None) -> bytes:
+        """Downloads the avatar with the given hash (as a byte
+        stream)."""
+        url = self.avatar_url(user_id, avatar_hash, size=size)
+        return self._request(url, route='/avatars/{user_id}/{avatar_hash}').content
+
+    def get_avatar(self, user_id: str, size: int | None = None) -> bytes:
+        """Looks up the user and downloads their current avatar (as a
+        byte stream)."""
+        avatar_hash = self.get_user_data(user_id)['avatar']
+        return self.get_avatar_image(user_id, avatar_hash, size=size)
+
+    def get_users_data(self, user_ids: Iterable[str]) -> dict[str, dict[str, Any]]:
+        """Gets the raw JSON user objects for all of the given users
+        concurrently, returning a dictionary keyed by user ID. If any
+        request fails, the first failure is raised."""
+        return self._concurrently(self.get_user_data, dict.fromkeys(user_ids))
+
+    def get_avatar_images(
+            self,
+            avatars: Iterable[tuple[str, str]],
+            size: int | None = None,
+    ) -> dict[tuple[str, str], bytes]:
+        """Downloads all of the given (user ID, avatar hash) avatars
+        concurrently, returning a dictionary keyed by those pairs. If
+        any request fails, the first failure is raised."""
+        return self._concurrently(
+            lambda avatar: self.get_avatar_image(avatar[0], avatar[1], size=size),
+            dict.fromkeys(avatars),
+        )
+
+    def get_avatars(self, user_ids: Iterable[str], size: int | None = None) -> dict[str, bytes]:
+        """Downloads the current avatars of all of the given users,
+        returning a dictionary keyed by user ID. Requests are issued
+        concurrently, up to this client's concurrency limit. If any
+        request fails, the first failure is raised."""
+        return self._concurrently(lambda user_id: self.get_avatar(user_id, size=size), dict.fromkeys(user_ids))
+
+    def _concurrently(self, func: Callable[[_K], _V], keys: Iterable[_K]) -> dict[_K, _V]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(keys))) as executor:
+            return dict(zip(keys, executor.map(func, keys)))
+
+    def _request(self, url: str, *, route: str, headers: dict[str, str] | None = None) -> requests.Response:
+        """Performs a GET request, honoring rate limits and retrying on
+        429 responses. The route is the template of the URL's path,
+        which identifies its rate limits before Discord has reported
+        its bucket. Raises requests.HTTPError on any other failure
+        status, or if the retries are exhausted."""
+        host = urlsplit(url).netloc
+        route = f"{host}{route}"
+        attempt = 0
+        while True:
+            self._wait_for_rate_limit(host, route)
+            with self._slots:
+                resp = self._session.get(url, headers=headers, timeout=self.timeout)
+            self._record_rate_limit(host, route, resp)
+            if resp.status_code == TOO_MANY_REQUESTS and attempt < self.max_retries:
+                attempt += 1
+                continue
+            resp.raise_for_status()
+            return resp
+
+    def _wait_for_rate_limit(self, host: str, route: str) -> None:
+        with self._rate_limit_lock:
+            bucket = self._route_buckets.get(route, route)
+            blocked_until = max(self._blocked_until.get(host, 0.0), self._blocked_until.get(bucket, 0.0))
+        delay = blocked_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _record_rate_limit(self, host: str, route: str, resp: requests.Response) -> None:
+        with self._rate_limit_lock:
+            if 'X-RateLimit-Bucket' in resp.headers:
+                self._route_buckets[route] = f"{host} {resp.headers['X-RateLimit-Bucket']}"
+            bucket = self._route_buckets.get(route, route)
+        delay: float | None = None
+        if resp.status_code == TOO_MANY_REQUESTS:
+            delay = _retry_after(resp)
+            if _is_global(resp):
+                bucket = host
+        elif resp.headers.get('X-RateLimit-Remaining') == '0':
+            delay = _float_header(resp, 'X-RateLimit-Reset-After')
+        if delay is None:
+            return
+        delay = min(max(delay, 0.0), MAX_BACKOFF_SECONDS)
+        with self._rate_limit_lock:
+            self._blocked_until[bucket] = max(self._blocked_until.get(bucket, 0.0), time.monotonic() + delay)
+
+
+def _float_header(resp: requests.Response, name: str) -> float | None:
+    try:
+        return float(resp.headers[name])
+    except (KeyError, ValueError):
+        return None
+
+
+def _is_global(resp: requests.Response) -> bool:
+    if resp.headers.get('X-RateLimit-Global', '').lower() == 'true':
+        return True
+    try:
+        return resp.json()['global'] is True
+    except (ValueError, KeyError, TypeError):
+        return False
+
+
+def _retry_after(resp: requests.Response) -> float:
+    # Discord puts the precise value in the JSON body; the header is
+    # a rounded fallback.
+    try:
+        return float(resp.json()['retry_after'])
+    except (ValueError, KeyError, TypeError):
+        pass
+    retry_after = _float_header(resp, 'Retry-After')
+    if retry_after is None:
+        retry_after = _float_header(resp, 'X-RateLimit-Reset-After')
+    return retry_after if retry_after is not None else 1.0
+
+
+_CLIENT: DiscordClient | None = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def get_client() -> DiscordClient:
+    """Returns the shared, process-wide DiscordClient, constructing it
+    on first use."""
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = DiscordClient()
+        return _CLIENT
@@ -3,11 +3,10 @@
 
 from __future__ import annotations
 
-from .config import request_headers
+from .client import get_client
 
 from attrs import define, field, validators
 import cattrs
-import requests
 
 
 @define(frozen=True)
@@ -23,22 +22,15 @@ class User:
     def get(cls, user_id: str) -> User:
         """Get a user's information from Discord, from their ID.
         Raises requests.HTTPError if the user does not exist."""
-        resp = requests.get(f"https://discord.com/api/v10/users/{user_id}", headers=request_headers())
-        resp.raise_for_status()
-        return cattrs.structure(resp.json(), cls)
+        return cattrs.structure(get_client().get_user_data(user_id), cls)
 
     def avatar_url(self, size: int | None = None) -> str:
         """Returns a URL at cdn.discordapp.com at which the user's
         avatar can be accessed.
 
         """
-        url = f"https://cdn.discordapp.com/avatars/{self.id}/{self.avatar}.png"
-        if size is not None:
-            url += f"?size={size}"
-        return url
+        return get_client().avatar_url(self.id, self.avatar, size=size)
 
     def get_avatar(self, size: int | None = None) -> bytes:
         """Gets the user's current avatar (as a byte stream)."""
-        resp = requests.get(self.avatar_url(size=size))
-        resp.raise_for_status()
-        return resp.content
+        return get_client().get_avatar_image(self.id, self.avatar, size=size)
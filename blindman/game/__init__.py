@@ -1,24 +1,63 @@
 
-from .board import Board
-from .command import Command, COMMAND_REGISTRY, parse_command
-from .engine import GameEngine
-from .error import InputParseError
-from .image import resolve_image_path
-from .input import InputFile, Configuration
-from .movement import MovementType, MovementPlanner
-from .object import GameObject
-from .renderer import GameRenderer
-from .timeline import Timeline
+from blindman.util.lazy import lazy_exports
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .board import Board
+    from .command import Command, COMMAND_REGISTRY, parse_command
+    from .compiler import compile_game, compile_file, compile_file_with_images, GameBuilder
+    from .engine import GameEngine
+    from .error import InputParseError
+    from .follow import Follower
+    from .image import ImageHandle, image_handle, resolve_image_path, preload_images
+    from .input import InputHeader, InputFile, InputStream, Configuration
+    from .movement import MovementType, MovementPlanner
+    from .object import GameObject
+    from .renderer import GameRenderer
+    from .timeline import Timeline
+    from .watch import Watcher
 
 __all__ = (
     'Board',
     'Command', 'COMMAND_REGISTRY', 'parse_command',
+    'compile_game', 'compile_file', 'compile_file_with_images', 'GameBuilder',
     'GameEngine',
     'InputParseError',
-    'resolve_image_path',
-    'InputFile', 'Configuration',
+    'Follower',
+    'ImageHandle', 'image_handle', 'resolve_image_path', 'preload_images',
+    'InputHeader', 'InputFile', 'InputStream', 'Configuration',
     'MovementType', 'MovementPlanner',
     'GameObject',
     'GameRenderer',
     'Timeline',
+    'Watcher',
 )
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    'Board': '.board',
+    'Command': '.command',
+    'COMMAND_REGISTRY': '.command',
+    'parse_command': '.command',
+    'compile_game': '.compiler',
+    'compile_file': '.compiler',
+    'compile_file_with_images': '.compiler',
+    'GameBuilder': '.compiler',
+    'GameEngine': '.engine',
+    'InputParseError': '.error',
+    'Follower': '.follow',
+    'ImageHandle': '.image',
+    'image_handle': '.image',
+    'resolve_image_path': '.image',
+    'preload_images': '.image',
+    'InputHeader': '.input',
+    'InputFile': '.input',
+    'InputStream': '.input',
+    'Configuration': '.input',
+    'MovementType': '.movement',
+    'MovementPlanner': '.movement',
+    'GameObject': '.object',
+    'GameRenderer': '.renderer',
+    'Timeline': '.timeline',
+    'Watcher': '.watch',
+})
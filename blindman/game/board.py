@@ -4,7 +4,14 @@ from __future__ import annotations
 from attrs import define, field
 
 from collections import defaultdict
-from typing import Iterable, NamedTuple
+from functools import lru_cache
+import math
+from typing import Callable, Iterable, NamedTuple
+
+# The distance between adjacent players sharing a space, in the
+# default layouts. Sprites are typically 32x32 (the size of a Discord
+# avatar), so neighbors overlap by half.
+DEFAULT_LAYOUT_SPACING = 16
 
 
 @define(eq=False)
@@ -19,17 +26,26 @@ class Board:
     includes actual human players, but it also includes inanimate
     things, such as items which are placed down on a space.
 
-    Under the current implementation, there is a soft limit of seven
-    players per space. This limit may be lifted in the future.
+    Any number of players may share a space. See get_layout for how
+    they are arranged.
 
     """
 
     # Maps space name position
     spaces_map: dict[str, tuple[int, int]]
+    # Distance between players sharing a space
+    layout_spacing: int = DEFAULT_LAYOUT_SPACING
     # Maps space name to players
     _position_map: dict[str, list[str]] = field(init=False, factory=lambda: defaultdict(list))
     # Maps player to space
     _player_map: dict[str, str] = field(init=False, factory=dict)
+    # Maps player to their index in _position_map[space]
+    _index_map: dict[str, int] = field(init=False, factory=dict)
+    # Maps player to the order in which they joined the board
+    _join_order: dict[str, int] = field(init=False, factory=dict)
+    _join_count: int = field(init=False, default=0)
+    # Called with a space's name before its occupancy changes
+    _space_listeners: list[Callable[[str], None]] = field(init=False, factory=list)
 
     @property
     def players(self) -> Iterable[str]:
@@ -37,6 +53,29 @@ class Board:
         unspecified order."""
         return self._player_map.keys()
 
+    @property
+    def join_count(self) -> int:
+        """The number of times a player has been added to the board.
+        See get_join_order."""
+        return self._join_count
+
+    def get_join_order(self, player_name: str) -> int:
+        """Returns the number of players added to the board before the
+        given player was (most recently) added. Iterating over
+        self.players lists the players in ascending order of this
+        value. Raises KeyError if the player is not on the board."""
+        return self._join_order[player_name]
+
+    def add_space_listener(self, listener: Callable[[str], None]) -> None:
+        """Registers a function to be called with the name of a space
+        just before any player enters or leaves that space."""
+        self._space_listeners.append(listener)
+
+    def remove_space_listener(self, listener: Callable[[str], None]) -> None:
+        """Unregisters a function registered with
+        add_space_listener."""
+        self._space_listeners.remove(listener)
+
     def add_player(self, player_name: str, starting_space: str) -> None:
         """Adds the player to the board, at the given position. Raises
         ValueError if the player is already on the board. Use
@@ -52,22 +91,41 @@ class Board:
         if starting_space not in self.spaces_map:
             raise ValueError(f"Space {starting_space} does not exist")
         self._player_map[player_name] = starting_space
-        self._position_map[starting_space].append(player_name)
+        self._join_order[player_name] = self._join_count
+        self._join_count += 1
+        self._append_to_space(player_name, starting_space)
 
     def remove_player(self, player_name: str) -> None:
         """Removes the player from the board. Raises KeyError if the
         player is not on the board."""
         space = self._player_map[player_name]
+        self._remove_from_space(player_name, space)
         del self._player_map[player_name]
-        self._position_map[space].remove(player_name)
+        del self._join_order[player_name]
 
     def move_player(self, player_name: str, destination_space: str) -> None:
         """Moves an existing player to a new space. Raises KeyError if
         the player is not on the board."""
         source_space = self._player_map[player_name]
-        self._position_map[source_space].remove(player_name)
+        self._remove_from_space(player_name, source_space)
         self._player_map[player_name] = destination_space
-        self._position_map[destination_space].append(player_name)
+        self._append_to_space(player_name, destination_space)
+
+    def _append_to_space(self, player_name: str, space: str) -> None:
+        for listener in self._space_listeners:
+            listener(space)
+        players = self._position_map[space]
+        self._index_map[player_name] = len(players)
+        players.append(player_name)
+
+    def _remove_from_space(self, player_name: str, space: str) -> None:
+        for listener in self._space_listeners:
+            listener(space)
+        players = self._position_map[space]
+        index = self._index_map.pop(player_name)
+        del players[index]
+        for later_index in range(index, len(players)):
+            self._index_map[players[later_index]] = later_index
 
     def get_players_at(self, space: str) -> list[str]:
         """Returns a list of all players at the given position. The
@@ -110,20 +168,48 @@ class Board:
         player's position to be slightly offset from the center of the
         space so that they are all visually represented.
 
-        This "slight offset" algorithm currently works for up to seven
-        players on the same space. If there are more than seven
-        players on a space, this method will raise KeyError.
-
         """
         space = self.get_space(player_name)
-        all_players_at_position = self._position_map[space]
-        player_index = all_players_at_position.index(player_name)
-        key = DeltaMapKey(player_count=len(all_players_at_position), player_index=player_index)
+        player_count = len(self._position_map[space])
         base_space_y, base_space_x = self.spaces_map[space]
-        delta_y, delta_x = DELTAS[key]
+        delta_y, delta_x = get_layout(player_count, self.layout_spacing)[self._index_map[player_name]]
         return base_space_y + delta_y, base_space_x + delta_x
 
 
+@lru_cache(maxsize=None)
+def get_layout(player_count: int, spacing: int = DEFAULT_LAYOUT_SPACING) -> tuple[tuple[int, int], ...]:
+    """Returns the offsets, as (height, width), from the center of a
+    space at which to draw each of player_count players sharing it.
+    Adjacent players are about spacing pixels apart.
+
+    Up to seven players use the hand-drawn arrangements in DELTAS.
+    Beyond that, players are laid out in a grid, as close to square as
+    possible, filled from the top left. Layouts are cached, since the
+    same few counts are requested over and over.
+
+    """
+    if player_count <= 0:
+        return ()
+    if player_count <= MAX_DELTAS_PLAYER_COUNT:
+        scale = spacing / DEFAULT_LAYOUT_SPACING
+        return tuple(
+            (round(delta_y * scale), round(delta_x * scale))
+            for delta_y, delta_x in (DELTAS[DeltaMapKey(player_count, i)] for i in range(player_count))
+        )
+    columns = math.ceil(math.sqrt(player_count))
+    rows = math.ceil(player_count / columns)
+    layout = []
+    for i in range(player_count):
+        row, column = divmod(i, columns)
+        # The last row may be short; center it.
+        row_length = min(columns, player_count - row * columns)
+        layout.append((
+            round((row - (rows - 1) / 2) * spacing),
+            round((column - (row_length - 1) / 2) * spacing),
+        ))
+    return tuple(layout)
+
+
 class DeltaMapKey(NamedTuple):
     """The key to the DELTAS map below: A player count together with
     the index of the intended player."""
@@ -131,6 +217,9 @@ class DeltaMapKey(NamedTuple):
     player_index: int
 
 
+MAX_DELTAS_PLAYER_COUNT = 7
+
+
 DELTAS = {
     DeltaMapKey(1, 0): (0, 0),
     DeltaMapKey(2, 0): (0, -16),
@@ -5,7 +5,7 @@ from .board import Board
 from .timeline import TimelineLike
 from .error import InputParseError
 from .movement import MovementPlanner, MovementType, MOVEMENT_LENGTHS
-from .image import resolve_image_path
+from .image import ImageHandle, image_handle
 from blindman.game.object.sprite import Sprite
 from blindman.game.object.text import Text
 from blindman.game.object.events import FadeObjectController, destroy_object_event
@@ -17,7 +17,9 @@ from cattrs.strategies import use_class_methods
 
 from abc import abstractmethod, ABC
 from dataclasses import dataclass
-from typing import Any, TYPE_CHECKING
+from fractions import Fraction
+from functools import partial
+from typing import Any, Callable, Iterable, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from blindman.game.engine import GameEngine
@@ -26,6 +28,10 @@ if TYPE_CHECKING:
 BOTTOM_TEXT_OBJECT_NAME = "__bottomtext"
 TITLE_TEXT_OBJECT_NAME = "__titletext"
 
+# (wait n) waits for n of these units, so that input files written for
+# the default 60 fps keep their timing at any frame rate.
+WAIT_UNITS_PER_SECOND = 60
+
 
 class Command(ABC):
     """A command acts on a Board."""
@@ -34,6 +40,12 @@ class Command(ABC):
     def execute(self, board: Board, timeline: TimelineLike) -> None:
         ...
 
+    def image_paths(self) -> Iterable[str]:
+        """The image paths this command will resolve when executed, in
+        the format accepted by image_handle. By default, a
+        command references no images."""
+        return ()
+
 
 @dataclass(frozen=True)
 class MovePlayerCommand(Command):
@@ -86,7 +98,7 @@ class ShufflePlayerCommand(Command):
 
     @classmethod
     def cattrs_structure(cls, data) -> 'ShufflePlayerCommand':
-        movements = cattrs.structure(data, tuple[tuple[str, str], ...])
+        movements = _COMMAND_CONVERTER.structure(data, tuple[tuple[str, str], ...])
         return cls(movements=movements)
 
 
@@ -103,12 +115,14 @@ class AddPlayerCommand(Command):
         animation_time = MOVEMENT_LENGTHS[MovementType.SHORT]
         with MovementPlanner(board, timeline):  # Movement planner for same-space adjustments
             position = board.spaces_map[self.space]
-            image = resolve_image_path(self.image_path)
+            image = image_handle(self.image_path)
             board[self.player_name] = self.space
 
-            def _factory(_):
-                return Sprite(position, image, self.player_name, alpha=0.0)
-            timeline.append_event(FadeObjectController.fade_in_event(_factory, animation_time))
+            factory = partial(_new_sprite, position, image, self.player_name)
+            timeline.append_event(FadeObjectController.fade_in_event(factory, timeline.frames(animation_time)))
+
+    def image_paths(self) -> Iterable[str]:
+        return (self.image_path,)
 
 
 @dataclass(frozen=True)
@@ -122,7 +136,9 @@ class DestroyPlayerCommand(Command):
         animation_time = MOVEMENT_LENGTHS[MovementType.SHORT]
         with MovementPlanner(board, timeline):  # Movement planner for same-space adjustments
             del board[self.player_name]
-            timeline.append_event(FadeObjectController.fade_out_event(self.player_name, animation_time))
+            timeline.append_event(
+                FadeObjectController.fade_out_event(self.player_name, timeline.frames(animation_time)),
+            )
 
 
 class SetTextCommand(Command):
@@ -145,21 +161,21 @@ class SetTextCommand(Command):
         pass
 
     def execute(self, board: Board, timeline: TimelineLike) -> None:
-        def _event(engine: 'GameEngine') -> None:
-            name = self.object_name()
-            if engine.has_object(name):
-                existing_text_object = engine.find_object(name)
-                assert isinstance(existing_text_object, Text)
-                existing_text_object.text = self.get_text()
-            else:
-                width, height, _ = engine.background_image.shape if engine.background_image is not None else (0, 0, 0)
-                new_text_object = Text(
-                    self.get_text(),
-                    name=name,
-                )
-                self.on_post_init(engine, new_text_object)
-                engine.add_object(new_text_object)
-        timeline.append_event(_event)
+        timeline.append_event(self._set_text)  # Bound method, so the event can be pickled
+
+    def _set_text(self, engine: 'GameEngine') -> None:
+        name = self.object_name()
+        if engine.has_object(name):
+            existing_text_object = engine.find_object(name)
+            assert isinstance(existing_text_object, Text)
+            existing_text_object.text = self.get_text()
+        else:
+            new_text_object = Text(
+                self.get_text(),
+                name=name,
+            )
+            self.on_post_init(engine, new_text_object)
+            engine.add_object(new_text_object)
 
 
 class ResetTextCommand(Command, ABC):
@@ -228,11 +244,24 @@ class ResetTitleTextCommand(ResetTextCommand):
 
 @dataclass(frozen=True)
 class WaitCommand(Command):
-    """Command to wait silently for the specified number of frames."""
-    frames: int
+    """Command to wait silently for the specified number of seconds.
+
+    In input files, the length is given in sixtieths of a second
+    (which is to say, in frames at the default frame rate), as
+    (wait 30) for half a second.
+
+    """
+    seconds: Fraction
+
+    @classmethod
+    def cattrs_structure(cls, data) -> 'WaitCommand':
+        (sixtieths,) = _COMMAND_CONVERTER.structure(data, tuple[int])
+        if sixtieths < 0:
+            raise InputParseError(f"Cannot wait for a negative time: {sixtieths}")
+        return cls(seconds=Fraction(sixtieths, WAIT_UNITS_PER_SECOND))
 
     def execute(self, board: Board, timeline: TimelineLike) -> None:
-        timeline.wait(self.frames)
+        timeline.wait(self.seconds)
 
 
 @dataclass(frozen=True)
@@ -242,10 +271,13 @@ class ChangeBackgroundCommand(Command):
 
     def execute(self, board: Board, timeline: TimelineLike) -> None:
         animation_time = MOVEMENT_LENGTHS[MovementType.LONG]
-        image = resolve_image_path(self.image_path)
-        timeline.append_event(FadeBackgroundController.event(image, total_frames=animation_time))
+        image = image_handle(self.image_path, rgb=True)
+        timeline.append_event(FadeBackgroundController.event(image, total_frames=timeline.frames(animation_time)))
         timeline.wait(animation_time)
 
+    def image_paths(self) -> Iterable[str]:
+        return (self.image_path,)
+
 
 COMMAND_REGISTRY: dict[str, type]
 COMMAND_REGISTRY = {
@@ -263,6 +295,10 @@ COMMAND_REGISTRY = {
 }
 
 
+def _new_sprite(position: tuple[int, int], image: ImageHandle, name: str, engine: 'GameEngine') -> Sprite:
+    return Sprite(position, image.load(), name, alpha=0.0)
+
+
 def parse_command(command_sexpr: Any) -> Command:
     """Parses the S-expression-like object into an appropriate Command
     subclass.
@@ -273,9 +309,13 @@ def parse_command(command_sexpr: Any) -> Command:
     if not command_sexpr:
         raise InputParseError("Expected non-empty list for command")
 
-    command_type = COMMAND_REGISTRY[str(command_sexpr[0])]
-    converter = _command_converter()
-    return converter.structure(tuple(command_sexpr[1:]), command_type)
+    command_name = str(command_sexpr[0])
+    try:
+        structure = _COMMAND_STRUCTURERS[command_name]
+    except KeyError:
+        # Commands registered after import time.
+        structure = _COMMAND_STRUCTURERS[command_name] = _command_structurer(COMMAND_REGISTRY[command_name])
+    return structure(tuple(command_sexpr[1:]))
 
 
 def _command_converter() -> cattrs.Converter:
@@ -284,3 +324,22 @@ def _command_converter() -> cattrs.Converter:
     )
     use_class_methods(converter, structure_method_name="cattrs_structure")
     return converter
+
+
+def _command_structurer(command_type: type) -> Callable[[tuple[Any, ...]], Command]:
+    """Returns a function structuring a command's arguments into the
+    given command type. Commands with a cattrs_structure class method
+    structure themselves, and the rest are structured field by field
+    from the tuple of arguments, as the converter would."""
+    structure: Callable[[tuple[Any, ...]], Command] | None = getattr(command_type, 'cattrs_structure', None)
+    if structure is None:
+        structure = partial(_COMMAND_CONVERTER.structure_attrs_fromtuple, cl=command_type)
+    return structure
+
+
+# The converter and the structurers are built once, since generating
+# cattrs hooks costs far more than using them.
+_COMMAND_CONVERTER = _command_converter()
+_COMMAND_STRUCTURERS: dict[str, Callable[[tuple[Any, ...]], Command]] = {
+    command_name: _command_structurer(command_type) for command_name, command_type in COMMAND_REGISTRY.items()
+}
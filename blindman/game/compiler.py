@@ -0,0 +1,305 @@
+
+"""Compiling input files into GameRenderers, with an on-disk cache.
+
+Compiling an input file (parsing it, structuring the commands,
+simulating the board, and resolving every image) is repeated work
+when the same game is rendered several times, for instance to
+different output formats. So compile_file caches the compiled
+GameRenderer under the cache directory, keyed by a hash of the input
+text. Each entry also records a fingerprint of every image the input
+referenced (the content hash of local files, and the current avatar
+hash of Discord users), and is only used if those still match. Set
+the NO_COMPILED_CACHE environment variable to disable this cache.
+
+Entries are pickled with blindman.game.persist, so images from the
+decoded-image cache are stored by reference.
+
+"""
+
+from __future__ import annotations
+
+from .board import Board
+from .engine import GameEngine
+from .image import resolve_image_path, preload_images, DISCORD_PREFIX
+from .input import InputHeader, InputStream
+from .object import EventManager
+from . import persist
+from .renderer import GameRenderer
+from .timeline import Timeline
+import blindman.discord as discord
+import blindman.util as util
+
+from collections import OrderedDict
+import dataclasses
+import hashlib
+import logging
+import os
+from pathlib import Path
+import pickle
+import sys
+import tempfile
+import threading
+from typing import Iterable, Iterator, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .command import Command
+
+logger = logging.getLogger(__name__)
+
+# Commands are read in batches of this size, so that the Discord
+# avatars they reference can be fetched together.
+COMMAND_BATCH_SIZE = 256
+
+NO_COMPILED_CACHE_FLAG = 'NO_COMPILED_CACHE'
+
+# Bump this if the layout of a cache entry changes, to invalidate old
+# entries. Changes to the blindman sources invalidate them anyway.
+_COMPILED_CACHE_VERSION = 1
+
+_READ_CHUNK_SIZE = 1024 * 1024
+
+# The number of local image fingerprints remembered in memory.
+FILE_DIGEST_ENTRIES = 256
+
+_source_fingerprint: str | None = None
+
+# Maps (real path, modification time, size) of local images to the
+# SHA-256 of their contents, so that checking cache entries (as watch
+# mode does on every change) does not re-read unchanged images.
+_file_digests: OrderedDict[tuple[str, int, int], str] = OrderedDict()
+_file_digests_lock = threading.Lock()
+
+
+def compile_game(input_header: InputHeader, commands: Iterable[Command]) -> GameRenderer:
+    """Builds the game engine and timeline for an input file. The
+    commands are executed as they are produced, so they may be a
+    stream which is parsed lazily."""
+    builder = GameBuilder(input_header)
+    for batch in util.batched(commands, COMMAND_BATCH_SIZE):
+        builder.execute(batch)
+    return builder.game_renderer()
+
+
+class GameBuilder:
+    """Builds the game engine and timeline for an input file, a few
+    commands at a time.
+
+    Commands only ever schedule events at the timeline's current
+    moment, and move it forward, so every frame before the current
+    moment is final: executing further commands never changes it. So
+    a game can be rendered up to the current moment while its
+    commands are still arriving (see blindman.game.follow).
+
+    """
+
+    def __init__(self, input_header: InputHeader) -> None:
+        # Set up the renderer and control objects.
+        self._config = input_header.config
+        self._engine = GameEngine()
+        event_manager = EventManager(self._engine)
+        self._engine.add_object(event_manager)
+
+        # Fetch all Discord avatars in the header up front, in one batch.
+        preload_images(input_header.image_paths())
+
+        # Show initial background image
+        background_image = resolve_image_path(input_header.config.background_image, allow_discord=False, rgb=True)
+        self._engine.background_image = background_image
+        self._width, self._height, _ = background_image.shape
+
+        # Set up the timeline and board manager.
+        self._timeline = Timeline(manager=event_manager, fps=input_header.config.fps)
+        self._board = Board(
+            spaces_map=input_header.spaces_map,
+        )
+
+        # Add initial objects to the game board.
+        all_game_objects = []
+        for obj in input_header.objects:
+            game_obj = obj.to_game_object(input_header.spaces_map)
+            all_game_objects.append(game_obj)
+            self._board[game_obj.name] = obj.space_name
+
+        # Position the players in the initial frame.
+        for game_obj in all_game_objects:
+            game_obj.position = self._board.get_position(game_obj.name)
+            self._engine.add_object(game_obj)
+
+    @property
+    def moment(self) -> int:
+        """The timeline's current moment, before which every frame is
+        final."""
+        return self._timeline.moment
+
+    def execute(self, commands: Iterable[Command]) -> None:
+        """Plays out the commands in order, fetching the Discord
+        avatars they reference together first."""
+        commands = list(commands)
+        preload_images(path for command in commands for path in command.image_paths())
+        for command in commands:
+            command.execute(self._board, self._timeline)
+
+    def game_renderer(self) -> GameRenderer:
+        """Returns a GameRenderer for the game so far, ending at the
+        current moment. The renderer shares this builder's engine, so
+        frames before the moment at which later commands finish can
+        be rendered by it too."""
+        return GameRenderer(
+            config=self._config,
+            engine=self._engine,
+            total_frames=self._timeline.moment,
+            width=self._width,
+            height=self._height,
+        )
+
+
+def compile_file(filename: str | os.PathLike, *, use_cache: bool = True) -> GameRenderer:
+    """Reads and compiles the input file with the given name, using
+    the compiled-input cache unless use_cache is False or the
+    NO_COMPILED_CACHE environment variable is set.
+
+    Relative image paths in the file are resolved relative to the
+    current working directory.
+
+    """
+    game_renderer, _ = compile_file_with_images(filename, use_cache=use_cache)
+    return game_renderer
+
+
+def compile_file_with_images(
+        filename: str | os.PathLike,
+        *,
+        use_cache: bool = True,
+        fps: int | None = None,
+) -> tuple[GameRenderer, list[str]]:
+    """As compile_file, but also returns every image path the input
+    file references, without duplicates. If fps is given, it replaces
+    the frame rate in the file's configuration (for a quicker preview,
+    say). Durations are in seconds, so the game keeps its timing."""
+    use_cache = use_cache and not os.environ.get(NO_COMPILED_CACHE_FLAG)
+    path = util.cache_dir() / 'compiled' / f"{_input_digest(filename, fps)}.pickle" if use_cache else None
+    if path is not None:
+        entry = _load_entry(path)
+        if entry is not None:
+            return entry
+
+    image_paths: list[str] = []
+    with InputStream.open(filename) as input_stream:
+        header = input_stream.header
+        if fps is not None:
+            header = dataclasses.replace(header, config=dataclasses.replace(header.config, fps=fps))
+        image_paths.extend(header.image_paths())
+        game_renderer = compile_game(
+            header,
+            _recording_image_paths(input_stream.commands(), image_paths),
+        )
+    image_paths = list(dict.fromkeys(image_paths))
+    if path is not None:
+        _store_entry(path, game_renderer, image_paths)
+    return game_renderer, image_paths
+
+
+def _recording_image_paths(commands: Iterable[Command], image_paths: list[str]) -> Iterator[Command]:
+    for command in commands:
+        image_paths.extend(command.image_paths())
+        yield command
+
+
+def _input_digest(filename: str | os.PathLike, fps: int | None) -> str:
+    """Hashes the input file, along with everything else which the
+    result of compiling it depends on."""
+    digest = hashlib.sha256()
+    digest.update(f"v{_COMPILED_CACHE_VERSION}\0{sys.version}\0{_get_source_fingerprint()}\0".encode('utf-8'))
+    digest.update(f"{fps}\0".encode('utf-8'))
+    with open(filename, 'rb') as input_file:
+        while chunk := input_file.read(_READ_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _get_source_fingerprint() -> str:
+    """Hashes the sources of the blindman package, so that cache
+    entries compiled by a different version are never used."""
+    global _source_fingerprint
+    if _source_fingerprint is None:
+        digest = hashlib.sha256()
+        package_dir = Path(__file__).resolve().parent.parent
+        for source in sorted(package_dir.rglob('*.py')):
+            digest.update(str(source.relative_to(package_dir)).encode('utf-8'))
+            digest.update(source.read_bytes())
+        _source_fingerprint = digest.hexdigest()
+    return _source_fingerprint
+
+
+def _image_fingerprints(image_paths: Iterable[str]) -> dict[str, str]:
+    """Fingerprints each image path: local files by their contents and
+    Discord users by their current avatar hash."""
+    image_paths = list(dict.fromkeys(image_paths))
+    user_ids = [path[len(DISCORD_PREFIX):] for path in image_paths if path.startswith(DISCORD_PREFIX)]
+    users = discord.get_users(user_ids) if user_ids else {}
+    fingerprints = {}
+    for path in image_paths:
+        if path.startswith(DISCORD_PREFIX):
+            fingerprints[path] = users[path[len(DISCORD_PREFIX):]].avatar
+        else:
+            fingerprints[path] = _file_digest(path)
+    return fingerprints
+
+
+def _file_digest(path: str) -> str:
+    """Returns the SHA-256 of the file's contents, only reading the
+    file if it has changed since it was last hashed."""
+    real_path = os.path.realpath(path)
+    stat = os.stat(real_path)
+    key = (real_path, stat.st_mtime_ns, stat.st_size)
+    with _file_digests_lock:
+        if key in _file_digests:
+            _file_digests.move_to_end(key)
+            return _file_digests[key]
+    digest = hashlib.sha256(Path(real_path).read_bytes()).hexdigest()
+    with _file_digests_lock:
+        _file_digests[key] = digest
+        if len(_file_digests) > FILE_DIGEST_ENTRIES:
+            _file_digests.popitem(last=False)
+    return digest
+
+
+def _load_entry(path: Path) -> tuple[GameRenderer, list[str]] | None:
+    """Loads the cache entry at the given path, along with the image
+    paths it references, or returns None if there is no usable entry
+    there."""
+    try:
+        with open(path, 'rb') as entry_file:
+            fingerprints = pickle.load(entry_file)
+            if _image_fingerprints(fingerprints) != fingerprints:
+                return None
+            game_renderer = persist.load(entry_file)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        # Anything at all can go wrong unpickling a stale or corrupt
+        # entry, and the fallback is always to recompile.
+        logger.warning(f"Ignoring unreadable compiled-input cache entry {path}: {e}")
+        return None
+    if not isinstance(game_renderer, GameRenderer):
+        return None
+    return game_renderer, list(fingerprints)
+
+
+def _store_entry(path: Path, game_renderer: GameRenderer, image_paths: list[str]) -> None:
+    """Writes a cache entry for the freshly compiled renderer, which
+    must not have rendered any frames yet."""
+    try:
+        fingerprints = _image_fingerprints(image_paths)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                pickle.dump(fingerprints, tmp_file, protocol=pickle.HIGHEST_PROTOCOL)
+                persist.dump(game_renderer, tmp_file)
+            os.replace(tmp_name, path)
+        except BaseException:
+            os.unlink(tmp_name)
+            raise
+    except (OSError, pickle.PicklingError) as e:
+        logger.warning(f"Could not write to compiled-input cache at {path.parent}: {e}")
@@ -35,6 +35,11 @@ class GameEngine:
         for obj in objects:
             obj.draw(frame_number, canvas)
 
+    @property
+    def objects(self) -> tuple[GameObject, ...]:
+        """All objects in the room, in the order they were added."""
+        return tuple(self._objects)
+
     def add_object(self, obj: GameObject) -> None:
         self._objects.append(obj)
 
@@ -0,0 +1,102 @@
+
+"""Follow mode: rendering a game while its commands are still being
+written.
+
+A Follower reads the header forms of an input, and then reads the
+commands one at a time, from a pipe (such as standard input) or from
+a file which is still growing. Each command is executed as soon as it
+arrives, and every frame up to the timeline's new moment is rendered
+and handed to the outputs straight away (see GameBuilder for why
+those frames are final). So, written to an HLS playlist, a game can
+be watched while it is still being played.
+
+The input ends with the closing parenthesis of the (commands ...)
+form. A growing file is polled for more text until then, however
+long that takes.
+
+"""
+
+from __future__ import annotations
+
+from .command import Command
+from .compiler import GameBuilder
+from .input import InputStream
+from blindman.renderer.video import OutputSink, VideoRenderer
+
+import io
+import logging
+import os
+import time
+from typing import Iterable, Iterator, TextIO
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 0.5  # seconds
+
+
+class Follower:
+    """Renders an input to the given sinks as it is read. The source
+    is either a text stream (read until it ends) or the name of a file
+    (read as it grows). Relative paths in the input are resolved
+    relative to the current working directory.
+
+    """
+
+    def __init__(
+            self,
+            source: TextIO | str | os.PathLike,
+            sinks: Iterable[OutputSink],
+            *,
+            poll_interval: float = DEFAULT_POLL_INTERVAL,
+    ) -> None:
+        self._source = source
+        self._sinks = list(sinks)
+        self._poll_interval = poll_interval
+
+    def run(self) -> int:
+        """Reads and renders the whole input, returning the number of
+        frames rendered. If the input is malformed, the frames before
+        the error are still written, and the error is raised."""
+        if isinstance(self._source, (str, os.PathLike)):
+            raw_file = _GrowingFile(io.FileIO(self._source), self._poll_interval)
+            with io.TextIOWrapper(io.BufferedReader(raw_file), encoding='utf-8') as input_file:
+                return self._follow(input_file)
+        return self._follow(self._source)
+
+    def _follow(self, input_file: TextIO) -> int:
+        input_stream = InputStream(input_file)
+        builder = GameBuilder(input_stream.header)
+        video_renderer = VideoRenderer(builder.game_renderer())
+        video_renderer.render_live(self._sinks, _frame_counts(builder, input_stream.commands()))
+        return builder.moment
+
+
+def _frame_counts(builder: GameBuilder, commands: Iterable[Command]) -> Iterator[int]:
+    """Executes each command as it is read, yielding the number of
+    final frames after each one."""
+    for command in commands:
+        builder.execute([command])
+        logger.debug(f"Executed {command!r}, frames are final up to {builder.moment}")
+        yield builder.moment
+
+
+class _GrowingFile(io.RawIOBase):
+    """A binary file which is still being written. At the end of the
+    file, reads wait for more data, rather than returning nothing, so
+    the file never ends."""
+
+    def __init__(self, file: io.FileIO, poll_interval: float) -> None:
+        self._file = file
+        self._poll_interval = poll_interval
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not (count := self._file.readinto(buffer)):
+            time.sleep(self._poll_interval)
+        return count
+
+    def close(self) -> None:
+        self._file.close()
+        super().close()
@@ -1,14 +1,143 @@
 
-from blindman.discord import get_avatar
+"""Loading images (from disk or Discord) as RGBA numpy arrays.
+
+Decoding a large PNG and converting it to RGBA is slow and briefly
+needs twice the memory of the result. So decoded images are cached on
+disk as .npy files, keyed by a hash of the encoded bytes, and later
+loads memory-map them read-only. Several processes rendering with the
+same assets then share one copy of each image in the page cache. Set
+the NO_IMAGE_CACHE environment variable to disable this cache.
+
+Compiled games refer to the images they will show through
+ImageHandles, which identify an image by the hash of its encoded bytes
+and are only loaded when an event actually shows the image. Loaded
+images are shared between everything which uses them, and are freed
+as soon as the last object showing them is destroyed, so that memory
+use depends on what is on screen rather than on the length of the
+game.
+
+Within a process, local images are also remembered by path and
+modification time, so that compiling the same input again (as in
+watch mode) does not even re-read unchanged image files.
+
+Images which are always drawn opaque, such as backgrounds, can be
+loaded as RGB instead, without the alpha channel. They are cached
+separately, and take a quarter less memory (and time to copy).
+
+Images returned by this module may be read-only and MUST NOT be
+modified in place.
+
+"""
+
+from __future__ import annotations
+
+import blindman.discord as discord
+import blindman.util as util
 
 import cv2
 import numpy as np
+from PIL import Image, UnidentifiedImageError
+
+from collections import OrderedDict
+from dataclasses import dataclass
+import hashlib
+import io
+import logging
+import os
+from pathlib import Path
+import tempfile
+import threading
+from typing import Iterable
+import weakref
+
+logger = logging.getLogger(__name__)
 
 DISCORD_AVATAR_SIZE = 32
+DISCORD_PREFIX = 'discord:'
+
+NO_IMAGE_CACHE_FLAG = 'NO_IMAGE_CACHE'
+
+# Bump this if the decoding pipeline changes, to invalidate old
+# entries.
+_IMAGE_CACHE_VERSION = 1
+
+# The number of local images remembered in memory.
+LOCAL_IMAGE_ENTRIES = 256
+
+_local_images: OrderedDict[tuple[str, int, int], ImageHandle] = OrderedDict()
+_local_images_lock = threading.Lock()
+
+# Every image which is currently loaded through an ImageHandle, by the
+# hash of its encoded bytes and whether it is RGB. An entry disappears
+# when the last reference to the image does.
+_live_images: weakref.WeakValueDictionary[tuple[str, bool], np.ndarray] = weakref.WeakValueDictionary()
+_live_images_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class ImageHandle:
+    """A reference to an image, which is loaded when it is needed.
+
+    image_path is an absolute local path, or a "discord:" path, and
+    digest is the SHA-256 hash of the encoded image. Handles are
+    cheap to keep and to pickle. The image itself is only held by
+    whoever calls load(), and is shared by every caller until all of
+    them release it.
+
+    """
+    image_path: str
+    digest: str
+
+    def load(self, *, rgb: bool = False) -> np.ndarray:
+        """Loads the image, as RGB if rgb is true and as RGBA if not.
+        If the image at image_path has changed since this handle was
+        made, and its old contents are no longer in the decoded-image
+        cache (or the cache is disabled), a warning is logged and the
+        new contents are loaded instead."""
+        key = (self.digest, rgb)
+        with _live_images_lock:
+            image = _live_images.get(key)
+        if image is not None:
+            return image
+        image = _load_cached(self.digest, rgb=rgb)
+        if image is None:
+            data = _read_image_bytes(self.image_path)
+            if hashlib.sha256(data).hexdigest() != self.digest:
+                logger.warning(f"{self.image_path} has changed since it was loaded, using its new contents")
+            image = decode_image(data, rgb=rgb)
+        with _live_images_lock:
+            return _live_images.setdefault(key, image)
+
+
+def image_handle(image_path: str, *, allow_discord: bool = True, rgb: bool = False) -> ImageHandle:
+    """Returns a handle to the image at the given path, which follows
+    the same rules as resolve_image_path. The image is decoded (into
+    the decoded-image cache, if enabled) to check that it is valid,
+    but is not kept in memory. Pass rgb=True if the image will be
+    loaded as RGB, so that the check decodes that variant."""
+    if image_path.startswith(DISCORD_PREFIX):
+        if not allow_discord:
+            raise ValueError('The "discord:" prefix is only allowed if "allow_discord=True"')
+        return _new_handle(image_path, _read_image_bytes(image_path), rgb)
+
+    path = os.path.realpath(image_path)
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _local_images_lock:
+        if key in _local_images:
+            _local_images.move_to_end(key)
+            return _local_images[key]
+    handle = _new_handle(path, Path(path).read_bytes(), rgb)
+    with _local_images_lock:
+        _local_images[key] = handle
+        if len(_local_images) > LOCAL_IMAGE_ENTRIES:
+            _local_images.popitem(last=False)
+    return handle
 
 
-def resolve_image_path(image_path: str, *, allow_discord: bool = True) -> np.ndarray:
-    """Load the image at the given path as a numpy array.
+def resolve_image_path(image_path: str, *, allow_discord: bool = True, rgb: bool = False) -> np.ndarray:
+    """Load the image at the given path as a numpy array (RGB if rgb
+    is true, and RGBA if not).
 
     If the path starts with "discord:", then it is read as a Discord
     user ID and loads the avatar for the given Discord user. In that
@@ -18,18 +147,90 @@ def resolve_image_path(image_path: str, *, allow_discord: bool = True) -> np.nda
     file system.
 
     """
-    if image_path.startswith('discord:'):
-        if not allow_discord:
-            raise ValueError('The "discord:" prefix is only allowed if "allow_discord=True"')
-        return _load_discord_image(image_path[8:])
-    else:
-        image = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
-        image = cv2.cvtColor(image, cv2.COLOR_BGRA2RGBA)
+    return image_handle(image_path, allow_discord=allow_discord, rgb=rgb).load(rgb=rgb)
+
+
+def preload_images(image_paths: Iterable[str]) -> None:
+    """Fetches every Discord avatar referenced by the given image
+    paths into the avatar cache in one batch, so that subsequent
+    resolve_image_path calls for them are served from the cache.
+    Paths which do not refer to Discord are ignored.
+
+    """
+    user_ids = [path[len(DISCORD_PREFIX):] for path in image_paths if path.startswith(DISCORD_PREFIX)]
+    if user_ids:
+        discord.get_avatars(user_ids, size=DISCORD_AVATAR_SIZE)
+
+
+def decode_image(data: bytes, *, rgb: bool = False) -> np.ndarray:
+    """Decodes an encoded image (such as the contents of a PNG file)
+    into an RGBA numpy array (or an RGB one, if rgb is true), using
+    the decoded-image cache if enabled."""
+    if os.environ.get(NO_IMAGE_CACHE_FLAG):
+        return _decode_image(data, rgb)
+
+    digest = hashlib.sha256(data).hexdigest()
+    cached_image = _load_cached(digest, rgb=rgb)
+    if cached_image is not None:
+        return cached_image
+
+    path = _cache_path(digest, rgb)
+    image = _decode_image(data, rgb)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                np.save(tmp_file, image)
+            os.replace(tmp_name, path)
+        except BaseException:
+            os.unlink(tmp_name)
+            raise
+        return np.load(path, mmap_mode='r')
+    except OSError as e:
+        logger.warning(f"Could not write to image cache at {path.parent}: {e}")
         return image
 
 
-def _load_discord_image(user_id: str) -> np.ndarray:
-    avatar_bytes = get_avatar(user_id, size=DISCORD_AVATAR_SIZE)
-    image = cv2.imdecode(np.frombuffer(avatar_bytes, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
-    image = cv2.cvtColor(image, cv2.COLOR_BGRA2RGBA)
+def _decode_image(data: bytes, rgb: bool) -> np.ndarray:
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise ValueError("Could not decode image")
+    image = cv2.cvtColor(image, cv2.COLOR_BGRA2RGB if rgb else cv2.COLOR_BGRA2RGBA)
     return image
+
+
+def _cache_path(digest: str, rgb: bool = False) -> Path:
+    variant = '.rgb' if rgb else ''
+    return util.cache_dir() / 'images' / f"{digest}{variant}.v{_IMAGE_CACHE_VERSION}.npy"
+
+
+def _load_cached(digest: str, *, rgb: bool = False) -> np.ndarray | None:
+    """Loads the image with the given digest from the decoded-image
+    cache, or returns None if it is not there (or the cache is
+    disabled)."""
+    if os.environ.get(NO_IMAGE_CACHE_FLAG):
+        return None
+    try:
+        return np.load(_cache_path(digest, rgb), mmap_mode='r')
+    except (OSError, ValueError):
+        return None  # Missing or corrupt
+
+
+def _new_handle(image_path: str, data: bytes, rgb: bool) -> ImageHandle:
+    if os.environ.get(NO_IMAGE_CACHE_FLAG):
+        # Decoding would be thrown away, and repeated when the image is
+        # loaded, so only check that the header is readable.
+        try:
+            Image.open(io.BytesIO(data)).close()
+        except UnidentifiedImageError:
+            raise ValueError("Could not decode image") from None
+    else:
+        decode_image(data, rgb=rgb)  # Checks the image, and fills the decoded-image cache
+    return ImageHandle(image_path, hashlib.sha256(data).hexdigest())
+
+
+def _read_image_bytes(image_path: str) -> bytes:
+    if image_path.startswith(DISCORD_PREFIX):
+        return discord.get_avatar(image_path[len(DISCORD_PREFIX):], size=DISCORD_AVATAR_SIZE)
+    return Path(image_path).read_bytes()
@@ -1,8 +1,21 @@
 
-from .file import InputFile, ObjectData
-from .config import Configuration
+from blindman.util.lazy import lazy_exports
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .file import InputHeader, InputFile, InputStream, ObjectData
+    from .config import Configuration
 
 __all__ = (
-    'InputFile', 'ObjectData',
+    'InputHeader', 'InputFile', 'InputStream', 'ObjectData',
     'Configuration',
 )
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    'InputHeader': '.file',
+    'InputFile': '.file',
+    'InputStream': '.file',
+    'ObjectData': '.file',
+    'Configuration': '.config',
+})
@@ -7,22 +7,37 @@ from blindman.game.image import resolve_image_path
 from blindman.game.command import Command, parse_command
 from blindman.game.object import Sprite
 from blindman.game.error import InputParseError
-from blindman.lisp import parse_many, Symbol
+from blindman.lisp import parse_many, LispReader, Symbol
 
 import cattrs
 
 from dataclasses import dataclass
-from typing import TextIO, Any, Mapping
+import os
+from typing import TextIO, Any, Iterator, Mapping
 from pathlib import Path
 
 
 @dataclass(frozen=True)
-class InputFile:
-    """The full data of a .lisp input file."""
+class InputHeader:
+    """The header forms of a .lisp input file: everything except the
+    commands."""
 
     config: Configuration
     spaces_map: dict[str, tuple[int, int]]
     objects: list['ObjectData']
+
+    def image_paths(self) -> list[str]:
+        """Returns every image path referenced by the header (in the
+        background and the initial objects), without duplicates."""
+        paths = [self.config.background_image]
+        paths.extend(obj.image_path for obj in self.objects)
+        return list(dict.fromkeys(paths))
+
+
+@dataclass(frozen=True)
+class InputFile(InputHeader):
+    """The full data of a .lisp input file."""
+
     commands: list[Command]
 
     @classmethod
@@ -51,6 +66,92 @@ class InputFile:
             commands=commands,
         )
 
+    def image_paths(self) -> list[str]:
+        """Returns every image path referenced by this file (in the
+        background, the initial objects, and the commands), without
+        duplicates."""
+        paths = super().image_paths()
+        for command in self.commands:
+            paths.extend(command.image_paths())
+        return list(dict.fromkeys(paths))
+
+
+class InputStream:
+    """A .lisp input file which is read incrementally.
+
+    The header forms are parsed when the stream is constructed and are
+    available as the header attribute. The commands are parsed one at
+    a time, as the commands() iterator is consumed, so neither the
+    S-expression tree of the (commands ...) form nor a list of Command
+    objects is ever held in memory all at once.
+
+    If constructed with open(), an InputStream owns its underlying
+    file and should be closed (or used as a context manager).
+
+    """
+
+    header: InputHeader
+
+    def __init__(self, source: str | TextIO) -> None:
+        """Reads the header from the source, which is either the full
+        text of an input file or a text stream positioned at the start
+        of one."""
+        self._reader = LispReader(source)
+        self._file: TextIO | None = None
+        self._commands_started = False
+        forms = []
+        for _ in range(3):
+            if self._reader.at_eof():
+                raise InputParseError("Expecting at least 4 elements in input file")
+            forms.append(self._reader.read())
+        self.header = InputHeader(
+            config=Configuration.from_sexpr(forms[0]),
+            spaces_map=_parse_spaces_map(forms[1]),
+            objects=_parse_objects(forms[2]),
+        )
+
+    @classmethod
+    def open(cls, filename: str | os.PathLike) -> 'InputStream':
+        """Opens the named file as an input stream."""
+        file = open(filename, encoding='utf-8')
+        try:
+            stream = cls(file)
+        except BaseException:
+            file.close()
+            raise
+        stream._file = file
+        return stream
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> 'InputStream':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def commands(self) -> Iterator[Command]:
+        """Parses and yields the commands, in order. This iterator can
+        only be consumed once."""
+        if self._commands_started:
+            raise ValueError("Commands have already been read from this stream")
+        self._commands_started = True
+
+        reader = self._reader
+        if reader.at_eof():
+            raise InputParseError("Expecting at least 4 elements in input file")
+        if reader.peek() != '(':
+            raise InputParseError("Expected a list of commands")
+        reader.begin_list()
+        if reader.at_list_end() or reader.read() != Symbol("commands"):
+            raise InputParseError("Expected (commands ...) form")
+        while not reader.at_list_end():
+            yield parse_command(reader.read())
+        reader.end_list()
+
 
 @dataclass(frozen=True)
 class ObjectData:
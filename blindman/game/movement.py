@@ -8,6 +8,7 @@ from blindman.game.object.events import MoveObjectController
 from attrs import define, field, evolve
 
 from enum import IntEnum, auto
+from fractions import Fraction
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -26,9 +27,10 @@ class MovementType(IntEnum):
     LONG = auto()
 
 
+# The length of each type of movement, in seconds.
 MOVEMENT_LENGTHS = {
-    MovementType.SHORT: 30,
-    MovementType.LONG: 60,
+    MovementType.SHORT: Fraction(1, 2),
+    MovementType.LONG: Fraction(1),
 }
 
 
@@ -44,27 +46,51 @@ class MovementPlanner:
     changes and prepare the animations.
 
     MovementPlanner can also be used as a context manager, which
-    automates much of this process.
+    automates much of this process. In that case, every player who
+    shares a space with someone who moves is also adjusted, with a
+    short movement. Only the spaces whose occupancy actually changes
+    are examined, so the cost of a movement does not grow with the
+    number of players on the board.
 
     """
     _board: Board
     _timeline: TimelineLike
     _players: dict[str, PlayerMovement] = field(init=False, factory=dict)
+    # Spaces whose players have been added to the current movement
+    _tracked_spaces: set[str] = field(init=False, factory=set)
+    # The board's join count when the movement began, or None if the
+    # planner is not being used as a context manager
+    _initial_join_count: int | None = field(init=False, default=None)
+    # Maps players added to the movement to a key which sorts them in
+    # the order they were added to the board (for those already on it
+    # when the movement began) and then in the order they were added
+    # to the movement
+    _order: dict[str, tuple[int, int]] = field(init=False, factory=dict)
 
     def __enter__(self) -> MovementPlanner:
-        # Add all players on the board with a trivial short movement,
-        # so that anyone who needs to adjust can do so.
-        for player in self._board.players:
-            self.add_player(player, MovementType.SHORT)
+        # Anyone on a space which is entered or left may need to
+        # adjust, so add them with a trivial short movement just
+        # before it happens.
+        self._initial_join_count = self._board.join_count
+        self._board.add_space_listener(self._on_space_changing)
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self._board.remove_space_listener(self._on_space_changing)
         if exc_type:
             return  # Let exceptions propagate and do not make any animations
 
         self.take_destination_snapshot()
         self.produce_movement()
 
+    def _on_space_changing(self, space: str) -> None:
+        if space in self._tracked_spaces:
+            return  # Everyone on it was added the first time
+        self._tracked_spaces.add(space)
+        for player in self._board.get_players_at(space):
+            if player not in self._players:
+                self.add_player(player, MovementType.SHORT)
+
     def add_player(self, player_name: str, movement_type: MovementType) -> None:
         """Adds the player to the current movement. If the player is
         already involved in the current movement, the existing entry
@@ -87,6 +113,11 @@ class MovementPlanner:
                 source=pos,
                 destination=pos,
             )
+            join_order = self._board.get_join_order(player_name)
+            if self._initial_join_count is not None and join_order < self._initial_join_count:
+                self._order[player_name] = (0, join_order)
+            else:
+                self._order[player_name] = (1, len(self._order))
 
     def take_destination_snapshot(self) -> None:
         """Update all player objects in the current movement to mark
@@ -103,14 +134,17 @@ class MovementPlanner:
         timeline.
 
         """
-        for player in self._players.values():
+        # Write the events in a consistent order, regardless of the
+        # order in which players joined the movement.
+        players = sorted(self._players.values(), key=lambda player: self._order[player.player_name])
+        for player in players:
             if player.player_name not in self._board:
                 # Player was removed during movement, do not animate.
                 continue
 
-            total_frames = MOVEMENT_LENGTHS[player.movement_type]
             if player.source == player.destination:
                 continue  # Do not make an event out of a trivial movement.
+            total_frames = self._timeline.frames(MOVEMENT_LENGTHS[player.movement_type])
             self._timeline.append_event(
                 MoveObjectController.event(
                     object_name=player.player_name,
@@ -119,7 +153,10 @@ class MovementPlanner:
                 ),
             )
 
-        max_length = max(MOVEMENT_LENGTHS[m.movement_type] for m in self._players.values())
+        max_length = max(
+            (MOVEMENT_LENGTHS[m.movement_type] for m in self._players.values()),
+            default=MOVEMENT_LENGTHS[MovementType.SHORT],
+        )
         max_length = max(max_length, MOVEMENT_LENGTHS[MovementType.SHORT])
         self._timeline.wait(max_length)
 
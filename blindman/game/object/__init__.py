@@ -1,10 +1,22 @@
 
-from .base import GameObject
-from .sprite import Sprite
-from .events import EventManager, MoveObjectController
+from blindman.util.lazy import lazy_exports
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .base import GameObject
+    from .sprite import Sprite
+    from .events import EventManager, MoveObjectController
 
 __all__ = (
     'GameObject',
     'Sprite',
     'EventManager', 'MoveObjectController',
 )
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    'GameObject': '.base',
+    'Sprite': '.sprite',
+    'EventManager': '.events',
+    'MoveObjectController': '.events',
+})
@@ -4,11 +4,14 @@ from __future__ import annotations
 from .base import GameObject
 from .events import Event, create_object_event
 from blindman.game.engine import GameEngine
+from blindman.game.image import ImageHandle
 from blindman.util import lerp, draw
 
 from attrs import define, field, Attribute
 import numpy as np
 
+from functools import partial
+
 
 BACKGROUND_Z_INDEX = -100
 
@@ -17,7 +20,7 @@ BACKGROUND_Z_INDEX = -100
 class FadeBackgroundController(GameObject):
     """A GameObject which interpolates a new background over time.
     This object removes itself from the room when interpolation is
-    complete."""
+    complete. Backgrounds are opaque, and loaded as RGB."""
 
     _game: GameEngine = field()
     image: np.ndarray = field()
@@ -74,12 +77,11 @@ class FadeBackgroundController(GameObject):
         self._game.background_image = self.image
 
     @classmethod
-    def event(cls, new_image: np.ndarray, total_frames: int) -> Event:
-        """An event which fades the background over time."""
-        def _factory(game: GameEngine) -> FadeBackgroundController:
-            return FadeBackgroundController(
-                game=game,
-                image=new_image,
-                total_frames=total_frames,
-            )
-        return create_object_event(_factory)
+    def event(cls, new_image: ImageHandle, total_frames: int) -> Event:
+        """An event which fades the background over time. The image is
+        only loaded when the event fires."""
+        return create_object_event(partial(_new_controller, new_image, total_frames))
+
+
+def _new_controller(image: ImageHandle, total_frames: int, game: GameEngine) -> FadeBackgroundController:
+    return FadeBackgroundController(game, image.load(rgb=True), total_frames)
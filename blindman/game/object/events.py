@@ -10,7 +10,8 @@ from attrs import define, field
 import numpy as np
 
 from collections import defaultdict
-from typing import Callable, Iterable
+from functools import partial
+from typing import Callable, Iterable, Iterator
 
 EVENT_MANAGER_NAME = '__eventmanager'
 
@@ -48,6 +49,8 @@ class EventManager(GameObject):
         """Adds an event scheduled to occur at the specified time.
 
         If the event_time is in the past, the event will never fire.
+        Events are discarded once they have fired, so that whatever
+        they hold on to can be freed.
         Events which are scheduled at the same moment in time will be
         executed in first-in-first-out order, so the first event
         scheduled for that time will be the first to execute.
@@ -55,10 +58,18 @@ class EventManager(GameObject):
         """
         self._events[event_time].append(event)
 
+    def scheduled_events(self) -> Iterator[tuple[int, list[Event]]]:
+        """Yields each moment at which events are scheduled, in
+        order, together with the events scheduled at that moment. The
+        lists MUST NOT be modified. Events which have already fired
+        are not included."""
+        for event_time in sorted(self._events):
+            yield event_time, self._events[event_time]
+
     def step(self, frame_number: int) -> None:
-        if frame_number in self._events:
-            for event in self._events[frame_number]:
-                event(self._game)
+        # Frames are only stepped once, so these events are done with.
+        for event in self._events.pop(frame_number, ()):
+            event(self._game)
 
     def draw(self, frame_number: int, canvas: np.ndarray) -> None:
         pass  # EventManager is a controller object; it does not draw.
@@ -67,10 +78,7 @@ class EventManager(GameObject):
 def create_object_event(object_factory: Callable[[GameEngine], GameObject]) -> Event:
     """An event which constructs a GameObject and adds it to the
     room."""
-
-    def _event(game: GameEngine) -> None:
-        game.add_object(object_factory(game))
-    return _event
+    return CreateObjectEvent(object_factory)
 
 
 def destroy_object_event(object_name: str, *, allow_nonexistent: bool = False) -> Event:
@@ -81,23 +89,48 @@ def destroy_object_event(object_name: str, *, allow_nonexistent: bool = False) -
     attempting to destroy a non-existent object is a no-op.
 
     """
-
-    def _event(game: GameEngine) -> None:
-        if game.has_object(object_name):
-            game.remove_object(object_name)
-        elif not allow_nonexistent:
-            raise ValueError(f'Object does not exist: {object_name}')
-    return _event
+    return DestroyObjectEvent(object_name, allow_nonexistent=allow_nonexistent)
 
 
 def many(events: Iterable[Event]) -> Event:
     """An event which fires multiple events in order during the same
     frame."""
+    return ManyEvent(tuple(events))
+
+
+# Events are plain data objects, rather than closures, so that a
+# compiled timeline can be pickled.
+
+@define(frozen=True)
+class CreateObjectEvent:
+    """See create_object_event."""
+    object_factory: Callable[[GameEngine], GameObject]
+
+    def __call__(self, game: GameEngine) -> None:
+        game.add_object(self.object_factory(game))
+
+
+@define(frozen=True)
+class DestroyObjectEvent:
+    """See destroy_object_event."""
+    object_name: str
+    allow_nonexistent: bool = field(default=False, kw_only=True)
+
+    def __call__(self, game: GameEngine) -> None:
+        if game.has_object(self.object_name):
+            game.remove_object(self.object_name)
+        elif not self.allow_nonexistent:
+            raise ValueError(f'Object does not exist: {self.object_name}')
+
+
+@define(frozen=True)
+class ManyEvent:
+    """See many."""
+    events: tuple[Event, ...]
 
-    def _execute_all(game: GameEngine) -> None:
-        for event in events:
+    def __call__(self, game: GameEngine) -> None:
+        for event in self.events:
             event(game)
-    return _execute_all
 
 
 @define(eq=False)
@@ -154,9 +187,9 @@ class MoveObjectController(GameObject):
 
         """
 
-        def _factory(game: GameEngine) -> MoveObjectController:
-            return MoveObjectController(game, object_name, new_pos, total_frames)
-        return create_object_event(_factory)
+        return create_object_event(
+            partial(MoveObjectController, object_name=object_name, new_pos=new_pos, total_frames=total_frames),
+        )
 
 
 @define(eq=False)
@@ -206,9 +239,15 @@ class FadeObjectController(GameObject):
         to the room.
 
         """
-        def _factory(game: GameEngine) -> FadeObjectController:
-            return FadeObjectController(game, object_name, old_alpha, new_alpha, total_frames)
-        return create_object_event(_factory)
+        return create_object_event(
+            partial(
+                FadeObjectController,
+                object_name=object_name,
+                old_alpha=old_alpha,
+                new_alpha=new_alpha,
+                total_frames=total_frames,
+            ),
+        )
 
     @classmethod
     def fade_in_event(cls, object_factory: Callable[[GameEngine], Sprite], total_frames: int) -> Event:
@@ -216,11 +255,7 @@ class FadeObjectController(GameObject):
         factory and performs a fade-in animation for it.
 
         """
-        def _event(game: GameEngine) -> None:
-            obj = object_factory(game)
-            game.add_object(obj)
-            game.add_object(FadeObjectController(game, obj.name, 0, 1, total_frames))
-        return _event
+        return FadeInEvent(object_factory, total_frames)
 
     @classmethod
     def fade_out_event(cls, object_name: str, total_frames: int) -> Event:
@@ -228,8 +263,25 @@ class FadeObjectController(GameObject):
         then removes it from the room at the end.
 
         """
-        def _event(game: GameEngine) -> None:
-            def _on_complete(_) -> None:
-                game.remove_object(object_name)
-            game.add_object(FadeObjectController(game, object_name, 1, 0, total_frames, on_complete=_on_complete))
-        return _event
+        return create_object_event(
+            partial(
+                FadeObjectController,
+                object_name=object_name,
+                old_alpha=1,
+                new_alpha=0,
+                total_frames=total_frames,
+                on_complete=destroy_object_event(object_name),
+            ),
+        )
+
+
+@define(frozen=True)
+class FadeInEvent:
+    """See FadeObjectController.fade_in_event."""
+    object_factory: Callable[[GameEngine], Sprite]
+    total_frames: int
+
+    def __call__(self, game: GameEngine) -> None:
+        obj = self.object_factory(game)
+        game.add_object(obj)
+        game.add_object(FadeObjectController(game, obj.name, 0, 1, self.total_frames))
@@ -0,0 +1,106 @@
+
+"""Pickling game state, with images stored by reference.
+
+Decoded images which are memory-mapped from the decoded-image cache
+(see blindman.game.image) are pickled as a reference to their .npy
+file, rather than by value. This keeps pickles of compiled games
+small, makes loading them share those images with other processes,
+and makes digests of game state cheap to compute.
+
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+import hashlib
+import mmap
+import pickle
+from typing import Any, BinaryIO, TypeVar
+
+T = TypeVar('T')
+
+
+class AssetPickler(pickle.Pickler):
+    """Pickler which stores whole memory-mapped .npy files by
+    reference. Use AssetUnpickler to load the result."""
+
+    def __init__(self, file: Any) -> None:
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def persistent_id(self, obj: Any) -> Any:
+        # Only the array np.load returned is backed directly by the
+        # mmap; views of it have another memmap as their base.
+        if isinstance(obj, np.memmap) and isinstance(obj.base, mmap.mmap) and obj.filename is not None:
+            return ('npy', obj.filename)
+        return None
+
+
+class AssetUnpickler(pickle.Unpickler):
+    """Unpickler for the output of AssetPickler. Raises
+    FileNotFoundError if a referenced image no longer exists."""
+
+    def persistent_load(self, pid: Any) -> Any:
+        kind, filename = pid
+        if kind != 'npy':
+            raise pickle.UnpicklingError(f"Unknown persistent ID {pid!r}")
+        return np.load(filename, mmap_mode='r')
+
+
+def dump(obj: Any, file: BinaryIO) -> None:
+    AssetPickler(file).dump(obj)
+
+
+def load(file: BinaryIO) -> Any:
+    return AssetUnpickler(file).load()
+
+
+def digest(obj: Any) -> str:
+    """Returns a hex digest of the pickled form of obj. obj must not
+    contain reference cycles. Equal objects usually have equal
+    digests, but this is not guaranteed (for instance, sets and dicts
+    with the same elements in a different order digest differently).
+    Conversely, objects which differ only in which of their values
+    are shared (rather than equal copies) digest the same.
+
+    """
+    hasher = _HashWriter()
+    pickler = AssetPickler(hasher)
+    # Without the memo, the digest does not depend on which equal
+    # values happen to be shared (such as strings, which unpickling
+    # does not intern).
+    pickler.fast = True
+    pickler.dump(obj)
+    return hasher.hash.hexdigest()
+
+
+def find_instances(obj: Any, cls: type[T]) -> list[T]:
+    """Returns every instance of cls in the pickled form of obj, in
+    the order they are pickled, without duplicates."""
+    found: dict[int, T] = {}
+
+    class Finder(AssetPickler):
+
+        def persistent_id(self, value: Any) -> Any:
+            if isinstance(value, cls):
+                found.setdefault(id(value), value)
+            return super().persistent_id(value)
+
+    Finder(_NullWriter()).dump(obj)
+    return list(found.values())
+
+
+class _NullWriter:
+
+    def write(self, data: bytes) -> int:
+        return len(data)
+
+
+class _HashWriter:
+
+    def __init__(self) -> None:
+        self.hash = hashlib.sha256()
+
+    def write(self, data: bytes) -> int:
+        self.hash.update(data)
+        return len(data)
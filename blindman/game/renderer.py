@@ -1,17 +1,26 @@
 
 from .input import Configuration
 from .engine import GameEngine
-from blindman.renderer import FrameRenderer
+from .image import ImageHandle
+from .object import EventManager, Sprite
+from . import persist
+from blindman.renderer.frame import FrameRenderer, TimelineDigest, RGB_CHANNELS
 
 import numpy as np
 from attrs import define, field
 
+from typing import Iterator
+
 
 @define(eq=False)
 class GameRenderer(FrameRenderer):
     """A FrameRenderer for rendering the game room based on a
     GameEngine.
 
+    Events are discarded as they fire, so a GameRenderer can only
+    render its frames once, in order. Call timeline_digest before
+    rendering any frames.
+
     """
 
     config: Configuration = field()
@@ -29,9 +38,49 @@ class GameRenderer(FrameRenderer):
     def frame_size(self) -> tuple[int, int]:
         return self.width, self.height
 
+    def color_channels(self) -> int:
+        # Backgrounds are opaque, so the canvas never needs an alpha
+        # channel.
+        return RGB_CHANNELS
+
     def render_frame(self, frame_number: int, canvas: np.ndarray) -> None:
         # Run one step of the game engine
         self.engine.perform_step(frame_number)
 
         # Now draw everything
         self.engine.render_frame(frame_number, canvas)
+
+    def skip_frame(self, frame_number: int, canvas: np.ndarray) -> None:
+        # The engine redraws the background over the whole canvas on
+        # every frame, so it never depends on the previous one.
+        self.engine.perform_step(frame_number)
+
+    def timeline_digest(self) -> TimelineDigest:
+        """Digests the initial objects and configuration, along with
+        the events scheduled at each frame."""
+        objects = []
+        changes: dict[int, list[str]] = {}
+        for obj in self.engine.objects:
+            if isinstance(obj, EventManager):
+                for event_time, events in obj.scheduled_events():
+                    changes.setdefault(event_time, []).append(persist.digest(events))
+            else:
+                objects.append(obj)
+        initial = persist.digest((self.config, self.width, self.height, self.engine.background_image, objects))
+        return TimelineDigest(
+            initial=initial,
+            changes={event_time: ':'.join(digests) for event_time, digests in changes.items()},
+            total_frames=self._total_frames,
+        )
+
+    def palette_images(self) -> Iterator[np.ndarray]:
+        """Yields the background and every sprite image, including
+        those of sprites which are created later."""
+        if self.engine.background_image is not None:
+            yield self.engine.background_image
+        for obj in self.engine.objects:
+            if isinstance(obj, EventManager):
+                for handle in persist.find_instances(list(obj.scheduled_events()), ImageHandle):
+                    yield handle.load()
+            elif isinstance(obj, Sprite):
+                yield obj.image
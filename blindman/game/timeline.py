@@ -5,6 +5,7 @@ from blindman.game.object.events import EventManager, Event
 
 from attrs import define, field
 
+from fractions import Fraction
 from typing import Protocol
 
 
@@ -14,13 +15,19 @@ class Timeline:
     convenience implemented on top of EventManager for writing events
     in a procedural way.
 
-    A Timeline starts at moment 0, and the moment can be advanced with
-    the wait() method. When an event is scheduled with append_event(),
-    the event is scheduled for the timeline's current moment.
+    A Timeline starts at time 0, and the time can be advanced with the
+    wait() method. Times are kept in seconds, as exact fractions, and
+    the moment (the frame number) is the time rounded to the nearest
+    frame at the given fps. So durations take the same time at any
+    frame rate, and rounding errors never add up over a long game.
+    When an event is scheduled with append_event(), the event is
+    scheduled for the timeline's current moment.
 
     """
 
     manager: EventManager
+    fps: int
+    time: Fraction = field(init=False, default=Fraction(0))
     moment: int = field(init=False, default=0)
 
     def append_event(self, *events: Event) -> None:
@@ -28,9 +35,19 @@ class Timeline:
         for event in events:
             self.manager.append_event(self.moment, event)
 
-    def wait(self, delta: int) -> None:
-        """Advance the timeline's moment."""
-        self.moment += delta
+    def wait(self, seconds: Fraction) -> None:
+        """Advance the timeline's time by the given number of
+        seconds."""
+        self.time += seconds
+        self.moment = round(self.time * self.fps)
+
+    def frames(self, seconds: Fraction) -> int:
+        """The number of frames from the current moment until the
+        moment the given number of seconds later. An animation of this
+        many frames, scheduled now, ends exactly when wait(seconds)
+        would. A positive duration is always at least one frame."""
+        frames = round((self.time + seconds) * self.fps) - self.moment
+        return max(frames, 1) if seconds > 0 else frames
 
 
 class TimelineLike(Protocol):
@@ -42,5 +59,8 @@ class TimelineLike(Protocol):
     def append_event(self, *events: Event) -> None:
         ...
 
-    def wait(self, delta: int) -> None:
+    def wait(self, seconds: Fraction) -> None:
+        ...
+
+    def frames(self, seconds: Fraction) -> int:
         ...
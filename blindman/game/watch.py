@@ -0,0 +1,122 @@
+
+"""Watch mode: re-rendering an input file whenever it changes.
+
+A Watcher renders the input file, then polls it and every local image
+it references, and renders again whenever one of them changes. Since
+the process stays alive, everything warmed up by one render is still
+warm for the next: imported modules, connections to Redis and
+Discord, the in-memory avatar and image caches, and the compiled-input
+cache. Renders are incremental (see blindman.renderer.incremental), so
+only the part of the video after the first changed frame is rendered
+again. For a quicker preview, the video may also be rendered at a
+lower frame rate than the input file asks for.
+
+"""
+
+from __future__ import annotations
+
+from .compiler import compile_file_with_images
+from .image import DISCORD_PREFIX
+from blindman.renderer.incremental import IncrementalVideoRenderer
+import blindman.util as util
+
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 0.5  # seconds
+
+# (modification time, size), or None if the file does not exist
+_FileState = tuple[int, int] | None
+
+
+class Watcher:
+    """Renders an input file to an output file every time the input
+    file or one of its local images changes. Relative paths in the
+    input file are resolved relative to its directory. If preview_fps
+    is given, it replaces the input file's frame rate.
+
+    """
+
+    def __init__(
+            self,
+            input_filename: str | os.PathLike,
+            output_filename: str | os.PathLike,
+            *,
+            poll_interval: float = DEFAULT_POLL_INTERVAL,
+            use_cache: bool = True,
+            preview_fps: int | None = None,
+    ) -> None:
+        self._input_filename = os.path.abspath(input_filename)
+        self._output_filename = os.path.abspath(output_filename)
+        self._working_dir = os.path.dirname(self._input_filename)
+        self._poll_interval = poll_interval
+        self._use_cache = use_cache
+        self._preview_fps = preview_fps
+        self._state_dir = IncrementalVideoRenderer.default_state_dir(self._input_filename, self._output_filename)
+        self._watched_files = [self._input_filename]
+        self._file_states: dict[str, _FileState] = {}
+
+    def run(self) -> None:
+        """Renders once, and then again after every change, forever.
+        Errors in the input file are logged, rather than raised, and
+        the next change is awaited as usual."""
+        self.render()
+        while True:
+            time.sleep(self._poll_interval)
+            if self._poll() == self._file_states:
+                continue
+            # Wait for the files to settle, since editors often save
+            # in several steps.
+            states = self._poll()
+            while True:
+                time.sleep(self._poll_interval)
+                settled_states = self._poll()
+                if settled_states == states:
+                    break
+                states = settled_states
+            self.render()
+
+    def render(self) -> bool:
+        """Compiles and renders the input file once, returning whether
+        it succeeded."""
+        # Record the states before compiling, so that any change made
+        # during the render triggers another one.
+        self._file_states = self._poll()
+        start = time.perf_counter()
+        try:
+            with util.cwd(self._working_dir):
+                game_renderer, image_paths = compile_file_with_images(
+                    self._input_filename, use_cache=self._use_cache, fps=self._preview_fps,
+                )
+            compiled = time.perf_counter()
+            video_renderer = IncrementalVideoRenderer(game_renderer, self._state_dir)
+            rendered_frames = video_renderer.render(self._output_filename)
+        except Exception:
+            logger.exception(f"Could not render {self._input_filename}")
+            # Keep watching the same files, so that fixing the error
+            # triggers another render.
+            return False
+        self._watched_files = [self._input_filename]
+        self._watched_files.extend(
+            os.path.join(self._working_dir, path) for path in image_paths if not path.startswith(DISCORD_PREFIX)
+        )
+        self._file_states = {path: self._file_states.get(path, state) for path, state in self._poll().items()}
+        logger.info(
+            f"Rendered {rendered_frames} of {game_renderer.total_frames()} frames to {self._output_filename} "
+            f"(compile {compiled - start:.2f} s, render {time.perf_counter() - compiled:.2f} s)"
+        )
+        return True
+
+    def _poll(self) -> dict[str, _FileState]:
+        states: dict[str, _FileState] = {}
+        for path in self._watched_files:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                states[path] = None
+            else:
+                states[path] = (stat.st_mtime_ns, stat.st_size)
+        return states
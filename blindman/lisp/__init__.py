@@ -2,11 +2,11 @@
 """Basic Lisp S-expression parser."""
 
 from .symbol import Symbol
-from .parser import parse, parse_many, LispParseError
+from .parser import parse, parse_many, LispReader, LispParseError
 from .deserialize import parse_key_value_list
 
 __all__ = (
     'Symbol',
-    'parse', 'parse_many', 'LispParseError',
+    'parse', 'parse_many', 'LispReader', 'LispParseError',
     'parse_key_value_list',
 )
@@ -15,7 +15,11 @@ available.
 
 from .symbol import Symbol
 
-from typing import Any
+import re
+import string
+from typing import Any, Callable, TextIO, TypeVar
+
+_T = TypeVar("_T")
 
 
 def parse(input_str: str) -> Any:
@@ -47,90 +51,214 @@ def parse_many(input_str: str) -> list[Any]:
     return result
 
 
-class _LispParser:
+class LispReader:
+    """Reads S-expressions incrementally, from either a string or a
+    text stream, without building a tree of the whole input.
 
-    def __init__(self, input_str: str) -> None:
-        self._input_str = input_str
-        self.pos = 0
+    read() parses one complete S-expression at a time. Alternatively,
+    begin_list(), at_list_end(), and end_list() allow a caller to
+    descend into a list and read its elements one by one. When
+    reading from a stream, input is pulled one line at a time only as
+    far as needed to finish the current request, and text which has
+    already been consumed is discarded. So memory stays bounded by the
+    size of the largest single form read, and a stream which is still
+    being written (such as a pipe) can be followed as it grows.
 
-    def is_eof(self) -> bool:
-        return self.pos >= len(self._input_str)
+    Positions in LispParseError are always relative to the start of
+    the whole input.
+
+    """
+
+    def __init__(self, source: str | TextIO) -> None:
+        if isinstance(source, str):
+            self._parser = _LispParser(source)
+            self._source: TextIO | None = None
+        else:
+            self._parser = _LispParser('')
+            self._source = source
+        self._offset = 0  # Position of the start of the buffer in the whole input
+
+    @property
+    def pos(self) -> int:
+        """The current position in the whole input."""
+        return self._offset + self._parser.pos
+
+    def read(self) -> Any:
+        """Reads the next S-expression."""
+        return self._attempt(self._parser.parse_sexpr)
 
     def peek(self) -> str:
-        try:
-            return self._input_str[self.pos]
-        except IndexError:
+        """Skips whitespace and returns the next character of input,
+        without consuming it. Returns the empty string at end of
+        input."""
+        def _peek() -> str:
+            self._parser.skip_whitespace()
+            return self._parser.peek_char()
+        return self._attempt(_peek)
+
+    def at_eof(self) -> bool:
+        """Returns true if only whitespace remains in the input."""
+        return not self.peek()
+
+    def begin_list(self) -> None:
+        """Consumes the opening parenthesis of a list."""
+        if self.peek() != '(':
+            raise LispParseError("Expected list", self.pos)
+        self._parser.pos += 1
+
+    def at_list_end(self) -> bool:
+        """Returns true if the next token is the closing parenthesis of
+        the current list. Raises LispParseError at end of input."""
+        char = self.peek()
+        if not char:
             raise LispParseError("Unexpected end of input", self.pos)
+        return char == ')'
 
-    def pop(self) -> str:
-        value = self.peek()
-        self.pos += 1
-        return value
+    def end_list(self) -> None:
+        """Consumes the closing parenthesis of the current list."""
+        if not self.at_list_end():
+            raise LispParseError("Expected end of list", self.pos)
+        self._parser.pos += 1
 
-    def parse_sexpr(self) -> Any:
-        self.skip_whitespace()
-        if self.peek() == '(':
-            return self.parse_list()
-        elif self.peek() == '"':
-            return self.parse_string()
-        else:
-            atom = self.parse_atom()
+    def _attempt(self, action: Callable[[], _T]) -> _T:
+        # Runs action against the buffered input. If it runs into the
+        # end of the buffer, the token in progress may continue in
+        # input we haven't read yet, so pull in more input and try
+        # again from the same starting point.
+        while True:
+            start = self._parser.pos
             try:
-                return int(atom)
-            except ValueError:
-                return Symbol(atom)
-
-    def parse_string(self) -> str:
-        self.pop()  # Consume opening quote
-        chars = []
-        while self.peek() != '"':
-            next_char = self.pop()
-            if next_char == '\\':
-                next_char = self.pop()
-                match next_char:
-                    case 'n':
-                        chars.append('\n')
-                    case _:
-                        chars.append(next_char)
+                result = action()
+                if self._source is None or self._parser.pos < len(self._parser.text):
+                    return result
+            except LispParseError as e:
+                if self._source is None or e.position < len(self._parser.text):
+                    raise LispParseError(e.args[0], e.position + self._offset) from None
+            self._parser.pos = start
+            if not self._refill():
+                self._source = None  # Exhausted; the next attempt is final
+
+    def _refill(self) -> bool:
+        assert self._source is not None
+        line = self._source.readline()
+        if not line:
+            return False
+        # Discard everything already consumed.
+        consumed = self._parser.pos
+        self._parser.text = self._parser.text[consumed:] + line
+        self._parser.pos = 0
+        self._offset += consumed
+        return True
+
+
+# Whitespace and line comments, which are skipped between tokens.
+_WHITESPACE_RE = re.compile(r'(?:[ \t\n]+|;[^\n]*\n?)*')
+# Everything up to the next delimiter is part of an atom.
+_ATOM_RE = re.compile(r'[^ \t\n()]*')
+# The run of ordinary characters in a string literal, up to the next
+# quote or escape.
+_STRING_CHUNK_RE = re.compile(r'[^"\\]*')
+
+# Atoms starting with one of these characters can never be integers,
+# so there is no need to try (and fail) to convert them.
+_SYMBOL_START_CHARS = frozenset(string.ascii_letters + ':')
+
+
+class _LispParser:
+    """Scanner over an input string. Rather than inspecting the input
+    one character at a time, each token is matched with a single
+    compiled regular expression. Lists are parsed with an explicit
+    stack, so deeply nested input cannot exhaust the recursion
+    limit."""
+
+    def __init__(self, input_str: str) -> None:
+        self.text = input_str
+        self.pos = 0
+
+    def is_eof(self) -> bool:
+        return self.pos >= len(self.text)
+
+    def parse_sexpr(self) -> Any:
+        text = self.text
+        end = len(text)
+        skip_whitespace = _WHITESPACE_RE.match
+        pos = skip_whitespace(text, self.pos).end()  # type: ignore # Always matches
+        stack: list[list[Any]] = []
+        value: Any
+        while True:
+            if stack and (pos >= end or text[pos] == ')'):
+                # Close the innermost list
+                if pos >= end:
+                    raise LispParseError("Unexpected end of input", end)
+                value = stack.pop()
+                pos += 1
+            elif pos >= end:
+                raise LispParseError("Unexpected end of input", end)
+            elif text[pos] == '(':
+                stack.append([])
+                pos = skip_whitespace(text, pos + 1).end()  # type: ignore # Always matches
+                continue
+            elif text[pos] == '"':
+                value, pos = _scan_string(text, pos)
             else:
-                chars.append(next_char)
-        self.pop()  # Consume closing quote
-        return ''.join(chars)
-
-    def parse_atom(self) -> str:
-        chars = []
-        while (not self.is_eof()) and self.peek() not in " \t\n()":
-            chars.append(self.pop())
-        return ''.join(chars)
-
-    def parse_list(self) -> list[Any]:
-        self.pop()  # Consume opening parenthesis
-        lst = self.parse_list_contents()
-        self.pop()  # Consume closing parenthesis
-        return lst
+                atom_end = _ATOM_RE.match(text, pos).end()  # type: ignore # Always matches
+                value = _atom_value(text[pos:atom_end])
+                pos = atom_end
+
+            if not stack:
+                self.pos = pos
+                return value
+            stack[-1].append(value)
+            pos = skip_whitespace(text, pos).end()  # type: ignore # Always matches
 
     def parse_list_contents(self) -> list[Any]:
         lst = []
         while True:
             self.skip_whitespace()
-            if self.is_eof() or self.peek() == ')':
+            if self.is_eof() or self.text[self.pos] == ')':
                 break
             lst.append(self.parse_sexpr())
         return lst
 
     def skip_whitespace(self) -> None:
-        while self.pos < len(self._input_str) and self.peek() in " \t\n;":
-            if self.peek() == ';':
-                self._skip_line_comment()
-            else:
-                self.pos += 1
-
-    def _skip_line_comment(self) -> None:
-        self.pop()  # Consume semicolon
-        while self.pos < len(self._input_str) and self.peek() != '\n':
-            self.pos += 1
-        if self.pos < len(self._input_str):
-            self.pop()  # Consume newline
+        self.pos = _WHITESPACE_RE.match(self.text, self.pos).end()  # type: ignore # Always matches
+
+    def peek_char(self) -> str:
+        """Returns the character at the current position, or the empty
+        string at end of input."""
+        return self.text[self.pos:self.pos + 1]
+
+
+def _scan_string(text: str, pos: int) -> tuple[str, int]:
+    """Scans the string literal whose opening quote is at pos,
+    returning its value and the position just past the closing
+    quote."""
+    end = len(text)
+    chunks = []
+    pos += 1  # Skip opening quote
+    while True:
+        chunk_end = _STRING_CHUNK_RE.match(text, pos).end()  # type: ignore # Always matches
+        chunks.append(text[pos:chunk_end])
+        pos = chunk_end
+        if pos >= end:
+            raise LispParseError("Unexpected end of input", end)
+        if text[pos] == '"':
+            return ''.join(chunks), pos + 1
+        # Backslash escape
+        if pos + 1 >= end:
+            raise LispParseError("Unexpected end of input", end)
+        escaped = text[pos + 1]
+        chunks.append('\n' if escaped == 'n' else escaped)
+        pos += 2
+
+
+def _atom_value(atom: str) -> Any:
+    if atom[:1] in _SYMBOL_START_CHARS:
+        return Symbol(atom)
+    try:
+        return int(atom)
+    except ValueError:
+        return Symbol(atom)
 
 
 class LispParseError(Exception):
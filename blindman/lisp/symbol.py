@@ -2,35 +2,61 @@
 """Defines the Symbol class, which is a thin wrapper around a string
 and is not equal to its corresponding string."""
 
+from __future__ import annotations
+
+import threading
+from typing import Any
+import weakref
+
 
 class Symbol:
     """Simple type to distinguish Lisp symbols from literal strings.
-    The current implementation of the Symbol class is NOT interned and
-    is merely a string under the hood.
+    Symbols are interned: constructing a symbol with the same name
+    twice returns the same object. So two symbols are equal if and
+    only if they are identical, and equality uses the default identity
+    comparison. Symbols and strings are never equal. A symbol is
+    dropped from the table once nothing refers to it, so long-running
+    processes do not keep every symbol they have ever read.
 
     Under this implementation, a symbol is a string-like value but is not an instance of str.
 
     """
+    __slots__ = ("_value", "_hash", "__weakref__")
+
     _value: str
+    _hash: int
 
     __match_args__ = ("_value",)
 
-    def __init__(self, value: str) -> None:
-        self._value = value
-
-    def __eq__(self, other: object) -> bool:
-        """Compares for value equality. A symbol is equal to another
-        symbol if and only if they are represented by the same string.
-        Symbols and strings are never equal."""
-        if isinstance(other, Symbol):
-            return self._value == other._value
-        return False
+    def __new__(cls, value: str) -> Symbol:
+        symbol = _SYMBOL_TABLE.get(value)
+        if symbol is not None:
+            return symbol
+        with _SYMBOL_TABLE_LOCK:
+            # Another thread may have made the symbol in the meantime.
+            symbol = _SYMBOL_TABLE.get(value)
+            if symbol is None:
+                symbol = super().__new__(cls)
+                symbol._value = value
+                # The hash is cached, since symbols are often used as
+                # dict keys.
+                symbol._hash = hash(("Symbol", value))
+                _SYMBOL_TABLE[value] = symbol
+            return symbol
 
     def __hash__(self) -> int:
-        return hash(("Symbol", self._value))
+        return self._hash
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        # Unpickled and copied symbols go through the table too.
+        return (Symbol, (self._value,))
 
     def __repr__(self) -> str:
         return f"Symbol({self._value!r})"
 
     def __str__(self) -> str:
         return self._value
+
+
+_SYMBOL_TABLE: weakref.WeakValueDictionary[str, Symbol] = weakref.WeakValueDictionary()
+_SYMBOL_TABLE_LOCK = threading.Lock()
@@ -1,10 +1,25 @@
 
 """Video rendering engine for Blind Man's Rampage."""
 
-from .video import VideoRenderer
-from .frame import FrameRenderer
+from blindman.util.lazy import lazy_exports
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .video import VideoRenderer, OutputSink
+    from .frame import FrameRenderer, TimelineDigest
+    from .incremental import IncrementalVideoRenderer
 
 __all__ = (
-    'VideoRenderer',
-    'FrameRenderer',
+    'VideoRenderer', 'OutputSink',
+    'FrameRenderer', 'TimelineDigest',
+    'IncrementalVideoRenderer',
 )
+
+__getattr__, __dir__ = lazy_exports(__name__, {
+    'VideoRenderer': '.video',
+    'OutputSink': '.video',
+    'FrameRenderer': '.frame',
+    'TimelineDigest': '.frame',
+    'IncrementalVideoRenderer': '.incremental',
+})
@@ -1,7 +1,14 @@
 
+from __future__ import annotations
+
 import numpy as np
 
 from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Iterable
+
+RGB_CHANNELS = 3
+RGBA_CHANNELS = 4
 
 
 class FrameRenderer(ABC):
@@ -26,6 +33,16 @@ class FrameRenderer(ABC):
         """Returns (height, width) of the desired canvas."""
         ...
 
+    def color_channels(self) -> int:
+        """The number of color channels of the canvas: RGBA_CHANNELS
+        (the default) or RGB_CHANNELS. The alpha channel of an RGBA
+        canvas is not used by any output, so renderers which do not
+        need it should use RGB, which is a quarter less to draw, copy,
+        and encode.
+
+        """
+        return RGBA_CHANNELS
+
     @abstractmethod
     def render_frame(self, frame_number: int, canvas: np.ndarray) -> None:
         """Render to the canvas which contains the previous frame. The
@@ -38,3 +55,64 @@ class FrameRenderer(ABC):
 
         """
         ...
+
+    def skip_frame(self, frame_number: int, canvas: np.ndarray) -> None:
+        """Advances past the given frame without needing its image,
+        subject to the same ordering guarantee as render_frame. The
+        default implementation renders the frame anyway. Subclasses
+        which override this to avoid drawing must not depend on the
+        canvas contents in the following render_frame call.
+
+        """
+        self.render_frame(frame_number, canvas)
+
+    def timeline_digest(self) -> TimelineDigest | None:
+        """Returns a summary of what this renderer will draw, for
+        comparison with an earlier render. Must be called before any
+        frames are rendered or skipped. The default implementation
+        returns None, meaning that the renderer cannot be summarized.
+
+        """
+        return None
+
+    def palette_images(self) -> Iterable[np.ndarray]:
+        """Returns the images whose colors the video is mostly made
+        of, for outputs with a limited palette. Must be called before
+        any frames are rendered or skipped. The default implementation
+        returns no images, leaving such outputs to use the colors of
+        the first frame.
+
+        """
+        return ()
+
+
+@dataclass(frozen=True)
+class TimelineDigest:
+    """A summary of everything a FrameRenderer will draw: a digest of
+    its initial state, and a digest of the changes scheduled at each
+    frame (frames with no changes are omitted). Two renderers with the
+    same initial state and the same changes up to some frame render
+    identical images up to that frame.
+
+    """
+
+    initial: str
+    changes: dict[int, str]
+    total_frames: int
+
+    def first_difference(self, other: TimelineDigest) -> int | None:
+        """Returns the first frame at which this renderer and the one
+        summarized by other may render differently, or None if they
+        render identical videos. Frames past the end of the shorter
+        video count as different."""
+        end = min(self.total_frames, other.total_frames)
+        if self.initial != other.initial:
+            return 0
+        for frame in sorted(self.changes.keys() | other.changes.keys()):
+            if frame >= end:
+                break
+            if self.changes.get(frame) != other.changes.get(frame):
+                return frame
+        if self.total_frames == other.total_frames:
+            return None
+        return end
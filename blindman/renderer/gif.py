@@ -0,0 +1,237 @@
+
+"""Writing animated GIFs.
+
+GifWriter replaces imageio's GIF writer for rendered videos. It
+quantizes every frame to one global palette, built up front from the
+images the video is made of, rather than building a palette for each
+frame. (Frames which the global palette cannot represent well, such
+as the middle of a cross-fade, get a smaller palette of their own.)
+Each frame only stores the rectangle which changed since the previous
+one, with pixels inside it which look unchanged left transparent, and
+runs of identical frames are stored once with a longer delay.
+
+GIF delays are in hundredths of a second, and browsers slow down
+frames shorter than two hundredths, so frames which would be shown
+for less than that are dropped (which is to say, the frame rate is
+capped at 50 fps).
+
+"""
+
+from __future__ import annotations
+
+import numpy as np
+from PIL import GifImagePlugin, Image
+
+import struct
+from typing import Any, BinaryIO, Iterable
+
+# The most colors in a palette, leaving one entry of the GIF color
+# table for transparency.
+MAX_PALETTE_COLORS = 255
+
+# The fewest colors in a palette made for a single frame.
+MIN_LOCAL_PALETTE_COLORS = 15
+
+# The shortest delay (in hundredths of a second) which browsers
+# honor.
+MIN_DELAY = 2
+
+# The mean error, per color channel, above which a frame gets its own
+# palette.
+LOCAL_PALETTE_ERROR = 4.0
+
+# The number of pixels sampled from each image to build the palette.
+PALETTE_SAMPLE_PIXELS = 1 << 14
+
+
+class GifWriter:
+    """Writes RGBA frames to an animated GIF, in the manner described
+    in the module documentation. The palette is built from the colors
+    of the first frame, together with palette_colors (typically from
+    sample_colors). The GIF loops forever.
+
+    """
+
+    def __init__(
+            self,
+            output_file: str | BinaryIO,
+            fps: int,
+            palette_colors: np.ndarray | None = None,
+    ) -> None:
+        self._palette_samples = [] if palette_colors is None else [palette_colors]
+        self._fps = fps
+        if isinstance(output_file, str):
+            self._file: BinaryIO = open(output_file, 'wb')
+            self._owns_file = True
+        else:
+            self._file = output_file
+            self._owns_file = False
+        # The global palette
+        self._palette: _Palette | None = None
+        # The frame shown at the moment, in RGB, as rendered and as
+        # quantized (None before the first frame is written), and the
+        # frame waiting to find out how long it is shown for, with the
+        # number of the first frame it is shown at.
+        self._shown: np.ndarray | None = None
+        self._displayed: np.ndarray | None = None
+        self._pending: np.ndarray | None = None
+        self._pending_start = 0
+        self._frame_count = 0
+
+    def __enter__(self) -> GifWriter:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def append_data(self, frame: np.ndarray) -> None:
+        rgb = np.ascontiguousarray(frame[:, :, :3])
+        if self._palette is None:
+            colors = np.concatenate([*self._palette_samples, sample_colors([frame])])
+            self._palette = _Palette.build(colors, MAX_PALETTE_COLORS)
+            self._palette_samples = []
+            self._write_header(rgb.shape[1], rgb.shape[0])
+        if self._pending is None:
+            self._pending = rgb
+        elif not np.array_equal(rgb, self._pending):
+            # A dropped frame's time goes to the frame after it.
+            if self._flush(self._frame_count):
+                self._pending_start = self._frame_count
+            self._pending = rgb
+        self._frame_count += 1
+
+    def close(self) -> None:
+        try:
+            if self._pending is not None:
+                self._flush(self._frame_count, force=True)
+            if self._palette is not None:
+                self._file.write(b';')  # Trailer
+        finally:
+            if self._owns_file:
+                self._file.close()
+
+    def _delay(self, start_frame: int, end_frame: int) -> int:
+        """The delay of a frame shown from start_frame up to end_frame,
+        in hundredths of a second. The delays are rounded so that
+        their sum does not drift from the real time."""
+        return round(end_frame * 100 / self._fps) - round(start_frame * 100 / self._fps)
+
+    def _flush(self, end_frame: int, *, force: bool = False) -> bool:
+        """Writes the pending frame, which is shown until end_frame, or
+        drops it if it is not shown for long enough. Returns whether
+        the frame was written."""
+        assert self._pending is not None and self._palette is not None
+        delay = self._delay(self._pending_start, end_frame)
+        if delay < MIN_DELAY and not force:
+            return False
+        frame = self._pending
+        if self._shown is None or self._displayed is None:
+            top, bottom, left, right = 0, frame.shape[0], 0, frame.shape[1]
+            indices, palette = self._quantize(frame)
+            self._displayed = palette.array[indices]
+        else:
+            changed = np.any(frame != self._shown, axis=2)
+            rows = np.flatnonzero(changed.any(axis=1))
+            columns = np.flatnonzero(changed.any(axis=0))
+            if len(rows) == 0:
+                # Only possible if the frames in between were dropped
+                top, bottom, left, right = 0, 1, 0, 1
+            else:
+                top, bottom = rows[0], rows[-1] + 1
+                left, right = columns[0], columns[-1] + 1
+            indices, palette = self._quantize(frame[top:bottom, left:right])
+            # Pixels which look the same as before are left
+            # transparent, which compresses much better.
+            colors = palette.array[indices]
+            displayed = self._displayed[top:bottom, left:right]
+            indices[np.all(colors == displayed, axis=2)] = palette.transparent_index
+            displayed[...] = colors
+        image = Image.fromarray(indices)
+        image.putpalette(palette.colors)
+        params: dict[str, Any] = {'duration': max(delay, 1) * 10, 'disposal': 1}
+        if palette is not self._palette:
+            params['include_color_table'] = True
+        if self._shown is not None:
+            params['transparency'] = palette.transparent_index
+        for data in GifImagePlugin.getdata(image, offset=(int(left), int(top)), **params):
+            self._file.write(data)
+        self._shown = frame
+        return True
+
+    def _quantize(self, rgb: np.ndarray) -> tuple[np.ndarray, _Palette]:
+        """Quantizes the RGB image to the global palette if it is close
+        enough, or to a palette of its own if not. Returns the palette
+        indices and the palette used."""
+        assert self._palette is not None
+        indices = self._palette.quantize(rgb)
+        error = np.abs(self._palette.array[indices].astype(np.int16) - rgb).mean()
+        if error <= LOCAL_PALETTE_ERROR:
+            return indices, self._palette
+        # Small rectangles do not need many colors, and a smaller
+        # palette takes less space.
+        height, width, _ = rgb.shape
+        palette = _Palette.build(rgb, min(max(height * width // 16, MIN_LOCAL_PALETTE_COLORS), MAX_PALETTE_COLORS))
+        return palette.quantize(rgb), palette
+
+    def _write_header(self, width: int, height: int) -> None:
+        assert self._palette is not None
+        table_size = len(self._palette.array).bit_length() - 2  # log2(entries) - 1
+        self._file.write(
+            b'GIF89a' +
+            struct.pack('<HHBBB', width, height, 0xF0 | table_size, 0, 0) +  # Global color table flag
+            bytes(self._palette.colors) +
+            b'!\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00'  # Loop forever
+        )
+
+
+def sample_colors(images: Iterable[np.ndarray]) -> np.ndarray:
+    """Returns a sample of the colors of the opaque parts of the given
+    RGBA images, as an array of RGB values, with a bounded number of
+    samples from each image."""
+    samples = [np.zeros((0, 3), dtype=np.uint8)]
+    for image in images:
+        pixels = image.reshape(-1, image.shape[2])
+        if image.shape[2] == 4:
+            pixels = pixels[pixels[:, 3] > 0]
+        step = max(len(pixels) // PALETTE_SAMPLE_PIXELS, 1)
+        samples.append(np.array(pixels[::step, :3]))
+    return np.concatenate(samples)
+
+
+class _Palette:
+    """A GIF color table, with one extra entry for transparency after
+    the colors. The table is padded to a power of two with copies of
+    the first color."""
+
+    def __init__(self, colors: np.ndarray) -> None:
+        self.transparent_index = len(colors)
+        size = 2
+        while size <= len(colors):
+            size *= 2
+        self.array = np.concatenate([colors, np.repeat(colors[:1], size - len(colors), axis=0)])
+        self.colors = self.array.flatten().tolist()
+        self._image = Image.new('P', (1, 1))
+        self._image.putpalette(self.colors)
+
+    @classmethod
+    def build(cls, colors: np.ndarray, count: int) -> _Palette:
+        """Builds a palette of at most count colors (which must be at
+        least one) representing the given array of RGB colors."""
+        quantized = Image.fromarray(np.ascontiguousarray(colors.reshape(-1, 1, 3))).quantize(
+            colors=count,
+            method=Image.Quantize.MEDIANCUT,
+            dither=Image.Dither.NONE,
+        )
+        used = int(np.array(quantized).max()) + 1
+        palette = np.array(quantized.getpalette() or [0, 0, 0], dtype=np.uint8).reshape(-1, 3)[:used]
+        return cls(palette)
+
+    def quantize(self, rgb: np.ndarray) -> np.ndarray:
+        """Returns the index of the nearest color to each pixel of the
+        RGB image."""
+        image = Image.fromarray(np.ascontiguousarray(rgb))
+        indices = np.array(image.quantize(palette=self._image, dither=Image.Dither.NONE))
+        # The padding duplicates the first color, so it may be chosen
+        # for that color.
+        indices[indices >= self.transparent_index] = 0
+        return indices
@@ -0,0 +1,201 @@
+
+"""Incremental re-rendering of a video which was rendered before.
+
+An IncrementalVideoRenderer encodes the video as a series of
+fixed-length segments, which it keeps in a state directory along with
+a TimelineDigest of the render. When the same state directory is used
+again (typically, because the input file was edited and recompiled),
+only the segments from the one containing the first changed frame
+onward are rendered and encoded again. The earlier segments are
+spliced into the output unchanged, without re-encoding.
+
+Splicing uses ffmpeg's concat demuxer, so the output must be in a
+container ffmpeg can concatenate losslessly, such as .mp4, .mkv,
+.mov, or .webm.
+
+"""
+
+from __future__ import annotations
+
+from .frame import FrameRenderer, TimelineDigest
+from .video import DEFAULT_CODECS
+import blindman.util as util
+
+import imageio.v2 as iio
+import imageio_ffmpeg  # type: ignore[import-untyped] # No type information
+import numpy as np
+
+from dataclasses import dataclass
+import hashlib
+import logging
+import os
+from pathlib import Path
+import pickle
+import secrets
+import subprocess
+import tempfile
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEGMENT_SECONDS = 10
+
+# Bump this if the layout of the state directory changes.
+_STATE_VERSION = 1
+
+_MANIFEST_NAME = 'manifest.pickle'
+
+
+class IncrementalVideoRenderer:
+    """A VideoRenderer which reuses the segments of the previous
+    render in the same state directory, as described in the module
+    documentation.
+
+    """
+
+    def __init__(
+            self,
+            frame_renderer: FrameRenderer,
+            state_dir: str | os.PathLike,
+            segment_seconds: int = DEFAULT_SEGMENT_SECONDS,
+    ) -> None:
+        self._frame_renderer = frame_renderer
+        self._state_dir = Path(state_dir)
+        self._segment_frames = max(segment_seconds * frame_renderer.fps(), 1)
+
+    @staticmethod
+    def default_state_dir(input_filename: str | os.PathLike, output_filename: str | os.PathLike) -> Path:
+        """Returns the state directory under the cache directory for
+        incremental renders of the given input file to the given
+        output format."""
+        key = f"{os.path.abspath(input_filename)}\0{Path(output_filename).suffix}"
+        return util.cache_dir() / 'renders' / hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def render(self, output_filename: str) -> int:
+        """Renders the video to the given file, and returns the number
+        of frames which had to be rendered (as opposed to reused)."""
+        suffix = Path(output_filename).suffix
+        total_frames = self._frame_renderer.total_frames()
+        if total_frames <= 0:
+            raise ValueError("Cannot render an empty video incrementally")
+        digest = self._frame_renderer.timeline_digest()
+
+        previous = self._load_manifest(suffix)
+        first_segment = 0
+        if previous is not None and digest is not None and previous.digest is not None:
+            first_difference = previous.digest.first_difference(digest)
+            if first_difference is None:
+                first_segment = len(previous.segments)
+            else:
+                first_segment = first_difference // self._segment_frames
+        reused = previous.segments[:first_segment] if previous is not None else []
+
+        self._state_dir.mkdir(parents=True, exist_ok=True)
+        segments = list(reused)
+        segments.extend(self._render_segments(first_segment, total_frames, suffix))
+        manifest = _Manifest(
+            version=_STATE_VERSION,
+            suffix=suffix,
+            fps=self._frame_renderer.fps(),
+            frame_size=self._frame_renderer.frame_size(),
+            segment_frames=self._segment_frames,
+            digest=digest,
+            segments=segments,
+        )
+        self._store_manifest(manifest)
+        self._remove_stale_segments(manifest)
+        self._concatenate(segments, output_filename)
+        return max(total_frames - first_segment * self._segment_frames, 0)
+
+    def _render_segments(self, first_segment: int, total_frames: int, suffix: str) -> list[str]:
+        """Renders and encodes every segment from first_segment on,
+        returning their file names."""
+        height, width = self._frame_renderer.frame_size()
+        canvas = np.zeros((height, width, self._frame_renderer.color_channels()), dtype=np.uint8)
+        start = first_segment * self._segment_frames
+        for i in range(min(start, total_frames)):
+            self._frame_renderer.skip_frame(i, canvas)
+
+        segments = []
+        for segment_start in range(start, total_frames, self._segment_frames):
+            segment_end = min(segment_start + self._segment_frames, total_frames)
+            # Fresh names, so that an interrupted render never
+            # overwrites a segment which the old manifest refers to.
+            name = f"segment-{segment_start // self._segment_frames:06d}-{secrets.token_hex(4)}{suffix}"
+            options: dict[str, Any] = {'fps': self._frame_renderer.fps()}
+            if suffix.lower() in DEFAULT_CODECS:
+                options['codec'] = DEFAULT_CODECS[suffix.lower()]
+            writer: Any  # __enter__ type is wrong in imageio pyi
+            with iio.get_writer(self._state_dir / name, **options) as writer:
+                for i in range(segment_start, segment_end):
+                    self._frame_renderer.render_frame(i, canvas)
+                    writer.append_data(canvas)
+            segments.append(name)
+        return segments
+
+    def _concatenate(self, segments: list[str], output_filename: str) -> None:
+        fd, list_name = tempfile.mkstemp(dir=self._state_dir, suffix='.txt')
+        try:
+            with os.fdopen(fd, 'w') as list_file:
+                for name in segments:
+                    list_file.write(f"file '{self._state_dir.resolve() / name}'\n")
+            subprocess.run(
+                [
+                    imageio_ffmpeg.get_ffmpeg_exe(), '-y', '-loglevel', 'error',
+                    '-f', 'concat', '-safe', '0', '-i', list_name,
+                    '-c', 'copy', output_filename,
+                ],
+                check=True,
+            )
+        finally:
+            os.unlink(list_name)
+
+    def _load_manifest(self, suffix: str) -> _Manifest | None:
+        """Loads the manifest of the previous render, if there is one
+        and its segments can be spliced into this render."""
+        try:
+            with open(self._state_dir / _MANIFEST_NAME, 'rb') as manifest_file:
+                manifest = pickle.load(manifest_file)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable render state in {self._state_dir}: {e}")
+            return None
+        compatible = (
+            isinstance(manifest, _Manifest) and
+            manifest.version == _STATE_VERSION and
+            manifest.suffix == suffix and
+            manifest.fps == self._frame_renderer.fps() and
+            manifest.frame_size == self._frame_renderer.frame_size() and
+            manifest.segment_frames == self._segment_frames and
+            all((self._state_dir / name).exists() for name in manifest.segments)
+        )
+        return manifest if compatible else None
+
+    def _store_manifest(self, manifest: _Manifest) -> None:
+        fd, tmp_name = tempfile.mkstemp(dir=self._state_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                pickle.dump(manifest, tmp_file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_name, self._state_dir / _MANIFEST_NAME)
+        except BaseException:
+            os.unlink(tmp_name)
+            raise
+
+    def _remove_stale_segments(self, manifest: _Manifest) -> None:
+        live = set(manifest.segments)
+        for path in self._state_dir.glob('segment-*'):
+            if path.name not in live:
+                path.unlink(missing_ok=True)
+
+
+@dataclass(frozen=True)
+class _Manifest:
+    """The record of a render, stored in its state directory."""
+    version: int
+    suffix: str
+    fps: int
+    frame_size: tuple[int, int]
+    segment_frames: int
+    digest: TimelineDigest | None
+    segments: list[str]
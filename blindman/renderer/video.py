@@ -2,13 +2,140 @@
 from __future__ import annotations
 
 from .frame import FrameRenderer
+from .gif import GifWriter, sample_colors
 
+import cv2
 import imageio.v2 as iio
+import imageio_ffmpeg  # type: ignore[import-untyped] # No type information
 import numpy as np
 
-from typing import Any, BinaryIO
+from dataclasses import dataclass
+from pathlib import Path
+import queue
+import sys
+import threading
+from typing import Any, BinaryIO, Generator, Iterable, Iterator
+from urllib.parse import parse_qsl
 
-COLOR_CHANNELS = 4  # RGBA
+# Codecs for containers which cannot hold imageio's default ffmpeg
+# codec (H.264).
+DEFAULT_CODECS = {
+    '.webm': 'libvpx-vp9',
+}
+
+# The default length of HLS segments.
+DEFAULT_SEGMENT_SECONDS = 6
+
+# An ffmpeg filter graph which drops every frame identical to the one
+# before it, but always keeps the last frame (with the given number),
+# followed by a copy of it one frame later. Otherwise the last frame
+# has no duration, and a final hold is cut short. Frames are padded to
+# even sizes, as the output pixel format requires.
+VFR_FILTER_GRAPH = (
+    "[0:v]pad=ceil(iw/2)*2:ceil(ih/2)*2,split[all][last];"
+    "[all]trim=end_frame={last_frame},mpdecimate=hi=0:lo=0:frac=0[distinct];"
+    "[last]trim=start_frame={last_frame},tpad=stop=1:stop_mode=clone[end];"
+    "[distinct][end]interleave"
+)
+
+# The number of frames which may be waiting for each encoder before
+# rendering waits for it to catch up.
+SINK_QUEUE_FRAMES = 8
+
+
+@dataclass(frozen=True)
+class OutputSink:
+    """One output of a VideoRenderer.
+
+    output_file is a filename or a binary file-like object. format is
+    an imageio format name or a file extension (such as ".gif"), which
+    is guessed from the filename if not given, and is required for
+    file-like objects. Only frames from start_frame up to (but
+    excluding) end_frame are written, and they are resized by the
+    factor scale.
+
+    If vfr is true, the video is written with a variable frame rate:
+    runs of identical frames (such as during waits) are encoded once,
+    and shown for the length of the run. This needs a container with
+    frame timestamps, such as .mp4, .mkv, or .webm. GIFs always merge
+    identical frames, regardless of vfr.
+
+    If output_file names an .m3u8 file, the video is written as an
+    HLS stream: a series of segment_seconds long .ts segments next to
+    the playlist, each starting with a keyframe. Each segment is added
+    to the playlist as soon as it is complete, so the stream can be
+    served (by any static file server) and watched while it is still
+    being rendered.
+
+    """
+
+    output_file: str | BinaryIO
+    format: str | None = None
+    start_frame: int = 0
+    end_frame: int | None = None
+    scale: float = 1.0
+    vfr: bool = False
+    segment_seconds: int = DEFAULT_SEGMENT_SECONDS
+
+    def __post_init__(self) -> None:
+        if self.start_frame < 0:
+            raise ValueError(f"Negative start frame: {self.start_frame}")
+        if self.end_frame is not None and self.end_frame < self.start_frame:
+            raise ValueError(f"End frame {self.end_frame} is before start frame {self.start_frame}")
+        if self.scale <= 0:
+            raise ValueError(f"Scale must be positive: {self.scale}")
+        if self.segment_seconds <= 0:
+            raise ValueError(f"Segment length must be positive: {self.segment_seconds}")
+        if self.is_hls() and not isinstance(self.output_file, str):
+            raise ValueError("HLS output must be written to a file")
+
+    @classmethod
+    def parse(cls, spec: str) -> OutputSink:
+        """Parses an output specification of the form
+        "FILENAME[?OPTION=VALUE&...]", where the options are format,
+        start, end, scale, vfr (1 or 0), and segment (in seconds). For
+        instance,
+        "teaser.gif?end=300&scale=0.5" is the first 300 frames of the
+        video, at half size, as a GIF."""
+        filename, _, query = spec.partition('?')
+        options: dict[str, Any] = {}
+        for key, value in parse_qsl(query, keep_blank_values=True, strict_parsing=bool(query)):
+            if key == 'format':
+                options['format'] = value
+            elif key == 'start':
+                options['start_frame'] = int(value)
+            elif key == 'end':
+                options['end_frame'] = int(value)
+            elif key == 'scale':
+                options['scale'] = float(value)
+            elif key == 'vfr':
+                if value not in ('0', '1'):
+                    raise ValueError(f"vfr must be 0 or 1, not {value!r}")
+                options['vfr'] = value == '1'
+            elif key == 'segment':
+                options['segment_seconds'] = int(value)
+            else:
+                raise ValueError(f"Unknown output option: {key}")
+        return cls(filename, **options)
+
+    def frame_range(self, total_frames: int) -> range:
+        end_frame = total_frames if self.end_frame is None else min(self.end_frame, total_frames)
+        return range(self.start_frame, end_frame)
+
+    def is_gif(self) -> bool:
+        """Whether this sink is written with GifWriter."""
+        return self._extension() == '.gif' or (self.format or '').lower() == 'gif'
+
+    def is_hls(self) -> bool:
+        """Whether this sink is written as an HLS stream."""
+        return self._extension() == '.m3u8'
+
+    def _extension(self) -> str:
+        if self.format is not None:
+            return self.format.lower() if self.format.startswith('.') else ''
+        if isinstance(self.output_file, str):
+            return Path(self.output_file).suffix.lower()
+        return ''
 
 
 class VideoRenderer:
@@ -26,10 +153,210 @@ class VideoRenderer:
         as a binary file-like output object.
 
         """
+        self.render_many([OutputSink(output_file)])
+
+    def render_many(self, sinks: Iterable[OutputSink]) -> None:
+        """Renders the video to several sinks at once. Each frame is
+        rendered once and handed to every sink which wants it, and
+        each sink encodes on its own thread, in parallel with the
+        others and with rendering. Frames which no sink wants are
+        skipped.
+
+        """
+        sinks = list(sinks)
+        total_frames = self._frame_renderer.total_frames()
+        palette_colors = self._palette_colors(sinks)
+        encoders = [
+            _Encoder(sink, sink.frame_range(total_frames), self._frame_renderer.fps(), palette_colors)
+            for sink in sinks
+        ]
+        self._render_encoders(encoders, [total_frames])
+
+    def render_live(self, sinks: Iterable[OutputSink], frame_counts: Iterable[int]) -> None:
+        """Renders the video to several sinks, as in render_many, while
+        the video is still being produced. frame_counts yields the
+        number of frames which are final so far, each time that
+        number grows, and every new final frame is rendered and handed
+        to the sinks before the next number is requested. The video
+        ends when frame_counts is exhausted, and the total_frames of
+        the FrameRenderer is not used.
+
+        Variable frame rate sinks need the length of the video up
+        front, so they are not supported here.
+
+        """
+        sinks = list(sinks)
+        for sink in sinks:
+            if sink.vfr:
+                raise ValueError(f"Variable frame rate output needs the whole video: {sink.output_file}")
+        palette_colors = self._palette_colors(sinks)
+        encoders = [
+            _Encoder(sink, sink.frame_range(sys.maxsize), self._frame_renderer.fps(), palette_colors)
+            for sink in sinks
+        ]
+        self._render_encoders(encoders, frame_counts)
+
+    def _palette_colors(self, sinks: list[OutputSink]) -> np.ndarray | None:
+        if not any(sink.is_gif() for sink in sinks):
+            return None
+        return sample_colors(self._frame_renderer.palette_images())
+
+    def _render_encoders(self, encoders: list[_Encoder], frame_counts: Iterable[int]) -> None:
+        end = max((encoder.frames.stop for encoder in encoders if encoder.frames), default=0)
         height, width = self._frame_renderer.frame_size()
-        canvas = np.zeros((height, width, COLOR_CHANNELS), dtype=np.uint8)
-        writer: Any  # __enter__ type is wrong in imageio pyi
-        with iio.get_writer(output_file, fps=self._frame_renderer.fps()) as writer:
-            for i in range(self._frame_renderer.total_frames()):
+        canvas = np.zeros((height, width, self._frame_renderer.color_channels()), dtype=np.uint8)
+        for encoder in encoders:
+            encoder.start()
+        try:
+            for i in _final_frames(frame_counts):
+                if i >= end:
+                    break
+                wanted_by = [encoder for encoder in encoders if i in encoder.frames]
+                if not wanted_by:
+                    self._frame_renderer.skip_frame(i, canvas)
+                    continue
                 self._frame_renderer.render_frame(i, canvas)
-                writer.append_data(canvas)
+                # The encoders share one copy, which none of them
+                # modify, while the canvas moves on to the next frame.
+                frame = canvas.copy()
+                for encoder in wanted_by:
+                    encoder.put(frame)
+                if any(encoder.error is not None for encoder in encoders):
+                    break
+        finally:
+            for encoder in encoders:
+                encoder.finish()
+        for encoder in encoders:
+            if encoder.error is not None:
+                raise encoder.error
+
+
+def _final_frames(frame_counts: Iterable[int]) -> Iterator[int]:
+    """Yields every frame number below each of the frame counts in
+    turn, each number once."""
+    frame_number = 0
+    for frame_count in frame_counts:
+        while frame_number < frame_count:
+            yield frame_number
+            frame_number += 1
+
+
+class _Encoder(threading.Thread):
+    """Writes the frames it is given to one OutputSink, on its own
+    thread. Errors are stored in self.error, after which further
+    frames are discarded."""
+
+    def __init__(self, sink: OutputSink, frames: range, fps: int, palette_colors: np.ndarray | None) -> None:
+        super().__init__(daemon=True)
+        self.sink = sink
+        self.frames = frames
+        self.error: BaseException | None = None
+        self._fps = fps
+        self._palette_colors = palette_colors
+        self._queue: queue.Queue[np.ndarray | None] = queue.Queue(maxsize=SINK_QUEUE_FRAMES)
+
+    def put(self, frame: np.ndarray) -> None:
+        self._queue.put(frame)
+
+    def finish(self) -> None:
+        """Waits for every frame given so far to be written, and closes
+        the output."""
+        if self.is_alive():
+            self._queue.put(None)
+            self.join()
+
+    def run(self) -> None:
+        try:
+            self._encode()
+        except BaseException as e:
+            self.error = e
+            while self._queue.get() is not None:
+                pass  # Keep the renderer from blocking on a full queue
+
+    def _encode(self) -> None:
+        writer: Any  # __enter__ type is wrong in imageio pyi
+        with self._open_writer() as writer:
+            while (frame := self._queue.get()) is not None:
+                writer.append_data(self._resize(frame))
+
+    def _open_writer(self) -> Any:
+        if self.sink.is_gif():
+            return GifWriter(self.sink.output_file, self._fps, self._palette_colors)
+        options: dict[str, Any] = {'fps': self._fps}
+        output_params: list[str] = []
+        if self.sink.format is not None:
+            options['format'] = self.sink.format
+        codec = DEFAULT_CODECS.get(self.sink._extension())
+        if codec is not None:
+            options['codec'] = codec
+        if self.sink.vfr and self.frames:
+            graph = VFR_FILTER_GRAPH.format(last_frame=len(self.frames) - 1)
+            output_params += ['-filter_complex', graph, '-fps_mode', 'vfr', '-enc_time_base', f'1/{self._fps}']
+            # Without B-frames, decoding timestamps follow presentation
+            # timestamps, and MP4 files take their length from the
+            # former, so the final hold is not cut short.
+            output_params += ['-bf', '0']
+            options['macro_block_size'] = 1  # The graph pads the frames instead
+        if self.sink.is_hls():
+            output_params += self._hls_params()
+        if output_params:
+            options['output_params'] = output_params
+        if self.sink.is_hls():
+            # imageio does not recognize playlists as video files.
+            assert isinstance(self.sink.output_file, str)
+            return _FfmpegWriter(self.sink.output_file, **options)
+        return iio.get_writer(self.sink.output_file, **options)
+
+    def _hls_params(self) -> list[str]:
+        assert isinstance(self.sink.output_file, str)
+        seconds = self.sink.segment_seconds
+        stem = Path(self.sink.output_file).with_suffix('')
+        return [
+            # Keyframes exactly on the segment boundaries, so that
+            # each segment can be played (and sought to) on its own.
+            '-force_key_frames', f'expr:gte(t,n_forced*{seconds})',
+            '-f', 'hls',
+            '-hls_time', str(seconds),
+            '-hls_list_size', '0',
+            '-hls_playlist_type', 'event',
+            '-hls_flags', 'independent_segments+temp_file',
+            '-hls_segment_filename', f'{stem}-%05d.ts',
+        ]
+
+    def _resize(self, frame: np.ndarray) -> np.ndarray:
+        if self.sink.scale == 1:
+            return frame
+        height, width, _ = frame.shape
+        size = (max(round(width * self.sink.scale), 1), max(round(height * self.sink.scale), 1))
+        return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+
+class _FfmpegWriter:
+    """A writer with the interface of imageio's, which passes its
+    arguments straight to imageio_ffmpeg.write_frames. The frame size
+    is taken from the first frame."""
+
+    def __init__(self, filename: str, **options: Any) -> None:
+        self._filename = filename
+        self._options = options
+        self._frames: Generator[None, np.ndarray | None, None] | None = None
+
+    def __enter__(self) -> _FfmpegWriter:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def append_data(self, frame: np.ndarray) -> None:
+        if self._frames is None:
+            height, width, channels = frame.shape
+            pix_fmt_in = 'rgba' if channels == 4 else 'rgb24'
+            self._frames = imageio_ffmpeg.write_frames(
+                self._filename, (width, height), pix_fmt_in=pix_fmt_in, **self._options,
+            )
+            self._frames.send(None)  # Start the generator
+        self._frames.send(np.ascontiguousarray(frame))
+
+    def close(self) -> None:
+        if self._frames is not None:
+            self._frames.close()
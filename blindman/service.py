@@ -0,0 +1,411 @@
+
+"""A long-running local render service.
+
+Starting main.py for every game pays for interpreter startup, imports,
+and cold caches every time, and nothing limits how many renders run at
+once. The render service instead accepts input files over HTTP and
+renders them on a fixed pool of worker processes. The workers stay
+alive between jobs, so their in-memory caches stay warm, and they
+share the on-disk caches (and Redis, if present) with each other.
+
+Run it with
+
+    python3 -m blindman.service [--port PORT] [--workers N] [--asset-dir DIR]
+
+The service listens on localhost only, and offers these endpoints:
+
+    POST   /jobs?format=mp4    Submit the request body (a .lisp file) as
+                               a new job. Responds 202 with {"id": ...}.
+    GET    /jobs               Status of every retained job.
+    GET    /jobs/ID[?wait=S]   Status of a job. With wait, blocks for up
+                               to S seconds until the job's state changes.
+    GET    /jobs/ID/output     The rendered file, once the job is done.
+    DELETE /jobs/ID            Forget a finished job and delete its files.
+    GET    /stats              Queue depth, and average timings of the
+                               retained jobs, for sizing the pool.
+
+Relative image paths in submitted files are resolved relative to the
+asset directory (by default, the current directory).
+
+"""
+
+from __future__ import annotations
+
+from blindman.worker import JobFailed, new_pool, new_start_queue, render_job
+
+from attrs import define, field
+
+import argparse
+import concurrent.futures
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import logging
+import os
+from pathlib import Path
+import re
+import secrets
+import shutil
+import tempfile
+import threading
+import time
+from typing import Any
+from urllib.parse import urlsplit, parse_qs
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8642
+DEFAULT_MAX_QUEUED_JOBS = 64
+DEFAULT_MAX_FINISHED_JOBS = 100
+MAX_INPUT_BYTES = 16 * 1024 * 1024
+MAX_WAIT_SECONDS = 60.0
+
+_FORMAT_RE = re.compile(r"[a-z0-9]{1,8}")
+_CHUNK_SIZE = 1024 * 1024
+
+
+@define(eq=False)
+class Job:
+    """A render job and what is known about its progress."""
+
+    id: str
+    format: str
+    directory: Path
+    submitted_at: float
+    future: concurrent.futures.Future | None = field(default=None)
+    started_at: float | None = field(default=None)
+    finished_at: float | None = field(default=None)
+    compile_seconds: float | None = field(default=None)
+    render_seconds: float | None = field(default=None)
+    total_frames: int | None = field(default=None)
+    error: str | None = field(default=None)
+
+    @property
+    def input_path(self) -> Path:
+        return self.directory / 'input.lisp'
+
+    @property
+    def output_path(self) -> Path:
+        return self.directory / f"output.{self.format}"
+
+    @property
+    def state(self) -> str:
+        if self.finished_at is not None:
+            return 'failed' if self.error is not None else 'done'
+        # Set when the worker announces that it has started the job
+        if self.started_at is not None:
+            return 'running'
+        return 'queued'
+
+    def status(self) -> dict[str, Any]:
+        queue_seconds = None
+        if self.started_at is not None:
+            queue_seconds = self.started_at - self.submitted_at
+        return {
+            'id': self.id,
+            'state': self.state,
+            'format': self.format,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'queue_seconds': queue_seconds,
+            'compile_seconds': self.compile_seconds,
+            'render_seconds': self.render_seconds,
+            'total_frames': self.total_frames,
+            'error': self.error,
+        }
+
+
+class RenderService:
+    """The job queue and worker pool behind the HTTP interface. Jobs
+    are stored, one directory each, under jobs_dir.
+
+    """
+
+    def __init__(
+            self,
+            jobs_dir: str | os.PathLike,
+            *,
+            workers: int,
+            asset_dir: str | os.PathLike = '.',
+            max_queued_jobs: int = DEFAULT_MAX_QUEUED_JOBS,
+            max_finished_jobs: int = DEFAULT_MAX_FINISHED_JOBS,
+    ) -> None:
+        self._jobs_dir = Path(jobs_dir)
+        self._asset_dir = os.path.abspath(asset_dir)
+        self._workers = workers
+        self._max_queued_jobs = max_queued_jobs
+        self._max_finished_jobs = max_finished_jobs
+        self._jobs: dict[str, Job] = {}
+        self._changed = threading.Condition()
+        self._start_queue = new_start_queue()
+        self._pool = new_pool(self._workers, self._start_queue)
+        self._start_listener = threading.Thread(target=self._listen_for_starts, daemon=True)
+        self._start_listener.start()
+
+    def submit(self, contents: bytes, output_format: str) -> Job:
+        """Queues a new job rendering the given input file. Raises
+        ServiceBusy if the queue is full."""
+        with self._changed:
+            queued = sum(1 for job in self._jobs.values() if job.state == 'queued')
+            if queued >= self._max_queued_jobs:
+                raise ServiceBusy(f"{queued} jobs are already queued")
+            job_id = secrets.token_hex(8)
+            job = Job(
+                id=job_id,
+                format=output_format,
+                directory=self._jobs_dir / job_id,
+                submitted_at=time.time(),
+            )
+            job.directory.mkdir(parents=True)
+            job.input_path.write_bytes(contents)
+            self._jobs[job_id] = job
+            job_args = (str(job.input_path), str(job.output_path), self._asset_dir, job_id)
+            try:
+                job.future = self._pool.submit(render_job, *job_args)
+            except concurrent.futures.process.BrokenProcessPool:
+                # A worker died (for instance, it was killed for using
+                # too much memory), so start over with a fresh pool.
+                logger.warning("Worker pool is broken; restarting it")
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = new_pool(self._workers, self._start_queue)
+                job.future = self._pool.submit(render_job, *job_args)
+        job.future.add_done_callback(lambda future: self._finish(job, future))
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        with self._changed:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> list[Job]:
+        with self._changed:
+            return list(self._jobs.values())
+
+    def wait(self, job: Job, timeout: float) -> None:
+        """Blocks until the job's state changes, or the timeout
+        expires."""
+        deadline = time.monotonic() + timeout
+        initial_state = job.state
+        with self._changed:
+            while job.state == initial_state and (remaining := deadline - time.monotonic()) > 0:
+                self._changed.wait(remaining)
+
+    def delete(self, job_id: str) -> bool:
+        """Forgets a finished job and deletes its files. Returns false
+        if there is no such finished job."""
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished_at is None:
+                return False
+            del self._jobs[job_id]
+        shutil.rmtree(job.directory, ignore_errors=True)
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        jobs = self.jobs()
+        states = [job.state for job in jobs]
+        finished = [job for job in jobs if job.state == 'done']
+
+        def mean(values: list[float | None]) -> float | None:
+            present = [value for value in values if value is not None]
+            return sum(present) / len(present) if present else None
+
+        return {
+            'workers': self._workers,
+            'queued': states.count('queued'),
+            'running': states.count('running'),
+            'done': states.count('done'),
+            'failed': states.count('failed'),
+            'mean_queue_seconds': mean([job.status()['queue_seconds'] for job in finished]),
+            'mean_compile_seconds': mean([job.compile_seconds for job in finished]),
+            'mean_render_seconds': mean([job.render_seconds for job in finished]),
+        }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._start_queue.put(None)  # Stops the listener
+
+    def _listen_for_starts(self) -> None:
+        while (start := self._start_queue.get()) is not None:
+            job_id, started_at = start
+            with self._changed:
+                job = self._jobs.get(job_id)
+                if job is not None and job.finished_at is None:
+                    job.started_at = started_at
+                    self._changed.notify_all()
+
+    def _finish(self, job: Job, future: concurrent.futures.Future) -> None:
+        with self._changed:
+            job.finished_at = time.time()
+            if future.cancelled():
+                job.error = 'Cancelled'
+            elif isinstance(error := future.exception(), JobFailed):
+                job.error = str(error)
+            elif error is not None:
+                job.error = f"{type(error).__name__}: {error}"
+            else:
+                timings = future.result()
+                job.started_at = timings['started_at']
+                job.compile_seconds = timings['compile_seconds']
+                job.render_seconds = timings['render_seconds']
+                job.total_frames = timings['total_frames']
+            self._changed.notify_all()
+            expired = self._expire_finished_jobs()
+        for expired_job in expired:
+            shutil.rmtree(expired_job.directory, ignore_errors=True)
+
+    def _expire_finished_jobs(self) -> list[Job]:
+        # Caller holds the lock.
+        finished = sorted(
+            (job for job in self._jobs.values() if job.finished_at is not None),
+            key=lambda job: job.finished_at or 0.0,
+        )
+        expired = finished[:max(len(finished) - self._max_finished_jobs, 0)]
+        for job in expired:
+            del self._jobs[job.id]
+        return expired
+
+
+class ServiceBusy(Exception):
+    """Raised when the render service's queue is full."""
+    pass
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    server: _RenderServer
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        service = self.server.service
+        if parts == ['stats']:
+            self._send_json(HTTPStatus.OK, service.stats())
+        elif parts == ['jobs']:
+            self._send_json(HTTPStatus.OK, [job.status() for job in service.jobs()])
+        elif len(parts) in (2, 3) and parts[0] == 'jobs':
+            job = service.get(parts[1])
+            if job is None:
+                self._send_json(HTTPStatus.NOT_FOUND, {'error': 'No such job'})
+            elif len(parts) == 2:
+                wait = parse_qs(url.query).get('wait')
+                if wait:
+                    try:
+                        service.wait(job, min(float(wait[0]), MAX_WAIT_SECONDS))
+                    except ValueError:
+                        self._send_json(HTTPStatus.BAD_REQUEST, {'error': 'Invalid wait'})
+                        return
+                self._send_json(HTTPStatus.OK, job.status())
+            elif parts[2] == 'output':
+                self._send_output(job)
+            else:
+                self._send_json(HTTPStatus.NOT_FOUND, {'error': 'Not found'})
+        else:
+            self._send_json(HTTPStatus.NOT_FOUND, {'error': 'Not found'})
+
+    def do_POST(self) -> None:
+        url = urlsplit(self.path)
+        if url.path.rstrip('/') != '/jobs':
+            self._send_json(HTTPStatus.NOT_FOUND, {'error': 'Not found'})
+            return
+        output_format = parse_qs(url.query).get('format', ['mp4'])[0]
+        if not _FORMAT_RE.fullmatch(output_format):
+            self._send_json(HTTPStatus.BAD_REQUEST, {'error': 'Invalid format'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', ''))
+        except ValueError:
+            self._send_json(HTTPStatus.LENGTH_REQUIRED, {'error': 'Content-Length required'})
+            return
+        if length > MAX_INPUT_BYTES:
+            self._send_json(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {'error': 'Input file too large'})
+            return
+        contents = self.rfile.read(length)
+        try:
+            job = self.server.service.submit(contents, output_format)
+        except ServiceBusy as e:
+            self._send_json(HTTPStatus.SERVICE_UNAVAILABLE, {'error': str(e)})
+            return
+        self._send_json(HTTPStatus.ACCEPTED, {'id': job.id})
+
+    def do_DELETE(self) -> None:
+        parts = [part for part in urlsplit(self.path).path.split('/') if part]
+        if len(parts) == 2 and parts[0] == 'jobs' and self.server.service.delete(parts[1]):
+            self._send_json(HTTPStatus.OK, {'id': parts[1]})
+        else:
+            self._send_json(HTTPStatus.NOT_FOUND, {'error': 'No such finished job'})
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.info(f"{self.address_string()} {format % args}")
+
+    def _send_output(self, job: Job) -> None:
+        if job.state != 'done':
+            self._send_json(HTTPStatus.CONFLICT, {'error': f"Job is {job.state}"})
+            return
+        try:
+            output_file = open(job.output_path, 'rb')
+        except FileNotFoundError:
+            self._send_json(HTTPStatus.GONE, {'error': 'Output was deleted'})
+            return
+        with output_file:
+            self.send_response(HTTPStatus.OK)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(os.fstat(output_file.fileno()).st_size))
+            self.send_header('Content-Disposition', f'attachment; filename="{job.id}.{job.format}"')
+            self.end_headers()
+            shutil.copyfileobj(output_file, self.wfile, _CHUNK_SIZE)
+
+    def _send_json(self, status: HTTPStatus, body: Any) -> None:
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _RenderServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], service: RenderService) -> None:
+        super().__init__(address, _RequestHandler)
+        self.service = service
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog='python3 -m blindman.service')
+    parser.add_argument('-p', '--port', type=int, default=DEFAULT_PORT,
+                        help=f'Port to listen on (default {DEFAULT_PORT})')
+    parser.add_argument('-w', '--workers', type=int, default=max(os.cpu_count() or 1, 1),
+                        help='Number of worker processes (default: one per CPU)')
+    parser.add_argument('--asset-dir', type=str, default='.',
+                        help='Directory that relative image paths are resolved against (default: current directory)')
+    parser.add_argument('--jobs-dir', type=str, default=None,
+                        help='Directory to store jobs in (default: a temporary directory)')
+    parser.add_argument('--max-queued-jobs', type=int, default=DEFAULT_MAX_QUEUED_JOBS,
+                        help=f'Reject new jobs while this many are queued (default {DEFAULT_MAX_QUEUED_JOBS})')
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    with tempfile.TemporaryDirectory(prefix='blindman-jobs-') as temp_dir:
+        service = RenderService(
+            args.jobs_dir or temp_dir,
+            workers=args.workers,
+            asset_dir=args.asset_dir,
+            max_queued_jobs=args.max_queued_jobs,
+        )
+        server = _RenderServer(('127.0.0.1', args.port), service)
+        logger.info(f"Listening on http://127.0.0.1:{args.port} with {args.workers} workers")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
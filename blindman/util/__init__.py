@@ -3,26 +3,41 @@
 
 from __future__ import annotations
 
-from .text import draw_text, draw_text_multiline, TextAlign
-
-import attrs
-import numpy as np
+from .lazy import lazy_exports
 
 from contextlib import contextmanager
 import itertools
 import os
-from typing import Iterable, Iterator, TypeVar, Literal, overload, Generator
+from pathlib import Path
+from typing import Iterable, Iterator, TypeVar, Literal, overload, Generator, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .introspect import attrs_field_names
+    from .drawing import draw
+    from .text import draw_text, draw_text_multiline, TextAlign
 
 __all__ = (
     'MAX_BYTE', 'ALPHA_CHANNEL',
     'attrs_field_names', 'pluck', 'draw', 'lerp', 'batched', 'pairs',
     'draw_text', 'draw_text_multiline', 'TextAlign',
-    'cwd',
+    'cwd', 'cache_dir',
 )
 
 MAX_BYTE = 255
 ALPHA_CHANNEL = 3
 
+CACHE_DIR_ENV_NAME = 'BLINDMAN_CACHE_DIR'
+
+# These helpers need attrs, numpy, or cv2, so they are only imported
+# on first use.
+__getattr__, __dir__ = lazy_exports(__name__, {
+    'attrs_field_names': '.introspect',
+    'draw': '.drawing',
+    'draw_text': '.text',
+    'draw_text_multiline': '.text',
+    'TextAlign': '.text',
+})
+
 
 _K = TypeVar("_K")
 _V = TypeVar("_V")
@@ -31,39 +46,12 @@ _T = TypeVar("_T")
 _T_number = TypeVar("_T_number", int, float)
 
 
-def attrs_field_names(cls: type) -> list[str]:
-    """Returns a list of the field names defined on an attrs class, in
-    definition order."""
-    return [f.name for f in attrs.fields(cls)]
-
-
 def pluck(dictionary: dict[_K, _V], keys: Iterable[_K]) -> dict[_K, _V]:
     """Retrieves only the given keys from the dictionary, returning a
     new dictionary. Raises KeyError on missing keys."""
     return {k: dictionary[k] for k in keys if k in dictionary}
 
 
-def draw(
-        destination: np.ndarray,
-        source: np.ndarray,
-        center: tuple[int, int],
-        *,
-        alpha: float = 1.0,
-) -> None:
-    """Draws the source image to the destination, centered at the
-    given position. An optional alpha channel multiplier can be
-    provided. If provided, it shall be a number from 0.0 to 1.0, where
-    0.0 is completely transparent and 1.0 is completely opaque.
-
-    """
-    upperleft_y, upperleft_x = center[0] - source.shape[0] // 2, center[1] - source.shape[1] // 2
-    lowerright_y, lowerright_x = upperleft_y + source.shape[0], upperleft_x + source.shape[1]
-    destination_patch = destination[upperleft_y:lowerright_y, upperleft_x:lowerright_x, :]
-    source_alpha = (source[:, :, (ALPHA_CHANNEL,)] / MAX_BYTE) * alpha
-    destination_patch = destination_patch * (1 - source_alpha) + source * source_alpha
-    destination[upperleft_y:lowerright_y, upperleft_x:lowerright_x, :] = destination_patch.astype(np.uint8)
-
-
 def lerp(a: _T_number, b: _T_number, x: _T_number) -> _T_number:
     return (1 - x) * a + x * b
 
@@ -74,6 +62,8 @@ def batched(iterable: Iterable[_T], n: Literal[1]) -> Iterator[tuple[_T]]: ...
 def batched(iterable: Iterable[_T], n: Literal[2]) -> Iterator[tuple[_T, _T]]: ...
 @overload
 def batched(iterable: Iterable[_T], n: Literal[3]) -> Iterator[tuple[_T, _T, _T]]: ...
+@overload
+def batched(iterable: Iterable[_T], n: int) -> Iterator[tuple[_T, ...]]: ...
 
 
 def batched(iterable: Iterable[_T], n: int) -> Iterator[tuple[_T, ...]]:
@@ -106,3 +96,14 @@ def cwd(new_cwd: str) -> Generator[None, None, None]:
         yield
     finally:
         os.chdir(old_cwd)
+
+
+def cache_dir() -> Path:
+    """Returns the root directory for on-disk caches. This is the
+    value of the BLINDMAN_CACHE_DIR environment variable if set, or a
+    blindman directory in the user's cache directory otherwise. The
+    directory is not created by this function."""
+    if CACHE_DIR_ENV_NAME in os.environ:
+        return Path(os.environ[CACHE_DIR_ENV_NAME])
+    xdg_cache_home = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(xdg_cache_home) / 'blindman'
@@ -0,0 +1,35 @@
+
+"""Compositing images onto a canvas."""
+
+from . import MAX_BYTE, ALPHA_CHANNEL
+
+import numpy as np
+
+
+def draw(
+        destination: np.ndarray,
+        source: np.ndarray,
+        center: tuple[int, int],
+        *,
+        alpha: float = 1.0,
+) -> None:
+    """Draws the source image to the destination, centered at the
+    given position. An optional alpha channel multiplier can be
+    provided. If provided, it shall be a number from 0.0 to 1.0, where
+    0.0 is completely transparent and 1.0 is completely opaque.
+
+    The destination may be RGB or RGBA. The source may be RGBA, in
+    which case its alpha channel is used as the blending weight, or
+    RGB, in which case it is opaque.
+
+    """
+    upperleft_y, upperleft_x = center[0] - source.shape[0] // 2, center[1] - source.shape[1] // 2
+    lowerright_y, lowerright_x = upperleft_y + source.shape[0], upperleft_x + source.shape[1]
+    destination_patch = destination[upperleft_y:lowerright_y, upperleft_x:lowerright_x, :]
+    if source.shape[2] > ALPHA_CHANNEL:
+        source_alpha = (source[:, :, (ALPHA_CHANNEL,)] / MAX_BYTE) * alpha
+    else:
+        source_alpha = np.full((1, 1, 1), alpha)
+    source_colors = source[:, :, :destination.shape[2]]
+    destination_patch = destination_patch * (1 - source_alpha) + source_colors * source_alpha
+    destination[upperleft_y:lowerright_y, upperleft_x:lowerright_x, :] = destination_patch.astype(np.uint8)
@@ -0,0 +1,10 @@
+
+"""Helpers for inspecting classes."""
+
+import attrs
+
+
+def attrs_field_names(cls: type) -> list[str]:
+    """Returns a list of the field names defined on an attrs class, in
+    definition order."""
+    return [f.name for f in attrs.fields(cls)]
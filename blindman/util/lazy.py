@@ -0,0 +1,49 @@
+
+"""Lazy re-exports for package __init__ modules.
+
+Several of our dependencies (cv2, imageio, requests, redis, ...) are
+expensive to import, and the CLI is frequently started just to do
+something small. Package __init__ modules therefore do not import
+their submodules eagerly. Instead, they declare which submodule each
+public name lives in, and the submodule is imported the first time
+the name is accessed.
+
+"""
+
+import importlib
+import sys
+from typing import Any, Callable
+
+
+def lazy_exports(
+        package_name: str,
+        exports: dict[str, str],
+) -> tuple[Callable[[str], Any], Callable[[], list[str]]]:
+    """Returns a (__getattr__, __dir__) pair implementing lazy
+    re-exports for the package with the given name, as described in
+    PEP 562. exports maps each public name to the (relative) name of
+    the submodule defining it.
+
+    Usage, in a package's __init__.py:
+
+        __getattr__, __dir__ = lazy_exports(__name__, {
+            'Board': '.board',
+        })
+
+    """
+
+    def __getattr__(name: str) -> Any:
+        try:
+            module_name = exports[name]
+        except KeyError:
+            raise AttributeError(f"module {package_name!r} has no attribute {name!r}") from None
+        value = getattr(importlib.import_module(module_name, package_name), name)
+        # Cache on the package, so that __getattr__ is only consulted
+        # once per name.
+        setattr(sys.modules[package_name], name, value)
+        return value
+
+    def __dir__() -> list[str]:
+        return sorted(set(vars(sys.modules[package_name])) | set(exports))
+
+    return __getattr__, __dir__
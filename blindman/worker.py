@@ -0,0 +1,93 @@
+
+"""Rendering input files in pools of worker processes.
+
+The render service (blindman.service) and batch mode (blindman.batch)
+both render on a concurrent.futures.ProcessPoolExecutor, created by
+new_pool. The workers live as long as the pool, so their in-memory
+caches stay warm from one job to the next.
+
+A pool can be given a queue (from new_start_queue) on which each
+worker announces the jobs it starts, since the pool itself only
+reports when a job is handed to a worker's call queue, which may be
+long before the job starts.
+
+"""
+
+from __future__ import annotations
+
+import blindman.util as util
+
+import concurrent.futures
+import multiprocessing
+import multiprocessing.queues
+import time
+from typing import Any
+
+# Spawned rather than forked, since the parent may run threads.
+_MP_CONTEXT = multiprocessing.get_context('spawn')
+
+# The queue on which this worker announces the jobs it starts, if any
+_start_queue: multiprocessing.queues.SimpleQueue | None = None
+
+
+class JobFailed(Exception):
+    """Raised by a worker when its job fails. The original exception
+    is converted to a message, since not every exception can be sent
+    back from the worker process."""
+    pass
+
+
+def new_pool(
+        workers: int,
+        start_queue: multiprocessing.queues.SimpleQueue | None = None,
+) -> concurrent.futures.ProcessPoolExecutor:
+    """Returns a pool of the given number of workers, suitable for
+    running render_job. If start_queue is given, render_job puts
+    (job_id, started_at) on it whenever it starts a job with an
+    ID."""
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=_MP_CONTEXT,
+        initializer=_init_worker,
+        initargs=(start_queue,),
+    )
+
+
+def new_start_queue() -> multiprocessing.queues.SimpleQueue:
+    """Returns a queue suitable for the start_queue of new_pool."""
+    return _MP_CONTEXT.SimpleQueue()
+
+
+def render_job(input_path: str, output_path: str, working_dir: str, job_id: str | None = None) -> dict[str, Any]:
+    """Compiles the input file and renders it to the output path, with
+    relative image paths resolved against working_dir. Returns the
+    job's timings. Raises JobFailed if anything goes wrong."""
+    from blindman.game.compiler import compile_file
+    from blindman.renderer.video import VideoRenderer
+
+    started_at = time.time()
+    if job_id is not None and _start_queue is not None:
+        _start_queue.put((job_id, started_at))
+    start = time.perf_counter()
+    try:
+        with util.cwd(working_dir):
+            game_renderer = compile_file(input_path)
+        compiled = time.perf_counter()
+        VideoRenderer(frame_renderer=game_renderer).render(output_path)
+    except Exception as e:
+        raise JobFailed(f"{type(e).__name__}: {e}") from None
+    return {
+        'started_at': started_at,
+        'compile_seconds': compiled - start,
+        'render_seconds': time.perf_counter() - compiled,
+        'total_frames': game_renderer.total_frames(),
+    }
+
+
+def _init_worker(start_queue: multiprocessing.queues.SimpleQueue | None) -> None:
+    global _start_queue
+    _start_queue = start_queue
+    # Import the heavy modules when each worker starts, rather than
+    # during its first job.
+    import blindman.game.compiler  # noqa: F401
+    import blindman.renderer.video  # noqa: F401
@@ -23,7 +23,8 @@
   ;; This must be a file path. It cannot be a Discord user ID.
   :background-image "Background.png"
   ;; fps (optional) is the frames per second of the video. Default
-  ;; value is 60.
+  ;; value is 60. Animations and waits take the same time at any
+  ;; frame rate, so a lower value renders fewer frames.
   :fps 60
   ;; start-space (optional) is a symbol representing the name of the
   ;; starting space. If not provided, defaults to the word "start".
@@ -99,7 +100,8 @@
   ;;
   ;; Hides any displayed title text.
   (hide-title)
-  ;; (wait frames)
+  ;; (wait sixtieths)
   ;;
-  ;; Do nothing for the specified amount of time.
+  ;; Do nothing for the specified amount of time, in sixtieths of a
+  ;; second (which is one frame each at the default 60 fps).
   (wait 30))
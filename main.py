@@ -1,78 +1,111 @@
 
 """Main entrypoint for Blind Man's Rampage video renderer."""
 
-from blindman.renderer import VideoRenderer
-from blindman.game import GameRenderer, InputFile, Board, Timeline, GameEngine, resolve_image_path
-from blindman.game.object import EventManager
+from __future__ import annotations
+
+# Packages are imported as modules, rather than importing names from
+# them, so that heavy dependencies only load when a render actually
+# needs them (and not, for instance, for --help).
+import blindman.renderer as renderer
+import blindman.game as game
 import blindman.util as util
 
 import argparse
+import dataclasses
+import logging
 import os
+import sys
 
 
 def parse_args():
     parser = argparse.ArgumentParser()
-    parser.add_argument('input_file', type=str, help='The input .lisp file to read')
-    parser.add_argument('-o', '--output-filename', required=True, type=str, help='The output path to write to')
+    parser.add_argument('input_file', type=str,
+                        help='The input .lisp file to read (with --follow, "-" reads standard input)')
+    parser.add_argument('-o', '--output-filename', required=True, action='append', type=str,
+                        help='The output path to write to, optionally followed by ?option=value&... '
+                             '(options: start, end, scale, format, vfr, segment). A path ending in .m3u8 '
+                             'is written as an HLS stream, in segments of the given length in seconds. '
+                             'May be given more than once')
+    parser.add_argument('--no-cache', action='store_true', help='Do not use or update the compiled-input cache')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Re-render only the part of the video which changed since the last incremental render')
+    parser.add_argument('--watch', action='store_true',
+                        help='Keep running, and re-render incrementally whenever the input file or its images change')
+    parser.add_argument('--preview-fps', type=int, metavar='FPS',
+                        help='With --watch, render at this frame rate rather than the input file\'s')
+    parser.add_argument('--follow', action='store_true',
+                        help='Render each command as soon as it is written to the input, which may be a pipe '
+                             'or a file which is still growing')
     return parser.parse_args()
 
 
-def compile(input_file: InputFile) -> GameRenderer:
-
-    # Set up the renderer and control objects.
-    game_engine = GameEngine()
-    event_manager = EventManager(game_engine)
-    game_engine.add_object(event_manager)
-
-    # Show initial background image
-    background_image = resolve_image_path(input_file.config.background_image, allow_discord=False)
-    game_engine.background_image = background_image
-
-    # Set up the timeline and board manager.
-    timeline = Timeline(manager=event_manager)
-    board = Board(
-        spaces_map=input_file.spaces_map,
-    )
-
-    # Add initial objects to the game board.
-    all_game_objects = []
-    for obj in input_file.objects:
-        game_obj = obj.to_game_object(input_file.spaces_map)
-        all_game_objects.append(game_obj)
-        board[game_obj.name] = obj.space_name
-
-    # Position the players in the initial frame.
-    for game_obj in all_game_objects:
-        game_obj.position = board.get_position(game_obj.name)
-        game_engine.add_object(game_obj)
-
-    # Play out the commands in order.
-    for command in input_file.commands:
-        command.execute(board, timeline)
-
-    width, height, _ = background_image.shape
-    return GameRenderer(
-        config=input_file.config,
-        engine=game_engine,
-        total_frames=timeline.moment,
-        width=width,
-        height=height,
-    )
+def absolute_sink(sink: renderer.OutputSink) -> renderer.OutputSink:
+    """Makes a sink parsed from the command line write to an absolute
+    path."""
+    assert isinstance(sink.output_file, str)
+    return dataclasses.replace(sink, output_file=os.path.abspath(sink.output_file))
 
 
 if __name__ == "__main__":
     args = parse_args()
-    input_file = InputFile.read_file(args.input_file)
-
-    output_filename = os.path.abspath(args.output_filename)
-
-    # Interpret relative paths in the .lisp file relative to its directory
-    working_dir = os.path.dirname(os.path.abspath(args.input_file))
-
-    with util.cwd(working_dir):
-        game_renderer = compile(input_file)
-
-    video_renderer = VideoRenderer(frame_renderer=game_renderer)
-    video_renderer.render(output_filename)
 
-    print("Done.")
+    try:
+        sinks = [renderer.OutputSink.parse(spec) for spec in args.output_filename]
+    except ValueError as e:
+        sys.exit(str(e))
+    # Resolve the outputs now, since the input is read from its own
+    # directory.
+    sinks = [absolute_sink(sink) for sink in sinks]
+    single_output = len(sinks) == 1 and sinks[0] == renderer.OutputSink(sinks[0].output_file)
+    if (args.incremental or args.watch) and not single_output:
+        sys.exit("--incremental and --watch write a single output, without options")
+    if args.follow and (args.incremental or args.watch):
+        sys.exit("--follow cannot be combined with --incremental or --watch")
+    if args.preview_fps is not None and not args.watch:
+        sys.exit("--preview-fps can only be used with --watch")
+    if args.preview_fps is not None and args.preview_fps <= 0:
+        sys.exit("--preview-fps must be positive")
+    if args.follow and any(sink.vfr for sink in sinks):
+        sys.exit("--follow cannot write variable frame rate output")
+    output_filename = os.path.abspath(args.output_filename[0])
+
+    input_filename = os.path.abspath(args.input_file)
+
+    if args.follow:
+        logging.basicConfig(level=logging.INFO, format='%(message)s')
+        # Relative paths are interpreted as below, or relative to the
+        # current directory for standard input.
+        if args.input_file == '-':
+            follower = game.Follower(sys.stdin, sinks)
+            rendered_frames = follower.run()
+        else:
+            with util.cwd(os.path.dirname(input_filename)):
+                follower = game.Follower(input_filename, sinks)
+                rendered_frames = follower.run()
+        print(f"Rendered {rendered_frames} frames.")
+        print("Done.")
+    elif args.watch:
+        logging.basicConfig(level=logging.INFO, format='%(message)s')
+        watcher = game.Watcher(input_filename, output_filename, use_cache=not args.no_cache,
+                               preview_fps=args.preview_fps)
+        try:
+            watcher.run()
+        except KeyboardInterrupt:
+            pass
+    else:
+        # Interpret relative paths in the .lisp file relative to its directory
+        working_dir = os.path.dirname(input_filename)
+
+        with util.cwd(working_dir):
+            game_renderer = game.compile_file(input_filename, use_cache=not args.no_cache)
+
+        if args.incremental:
+            state_dir = renderer.IncrementalVideoRenderer.default_state_dir(input_filename, output_filename)
+            incremental_renderer = renderer.IncrementalVideoRenderer(game_renderer, state_dir)
+            rendered_frames = incremental_renderer.render(output_filename)
+            print(f"Rendered {rendered_frames} of {game_renderer.total_frames()} frames.")
+        else:
+            video_renderer = renderer.VideoRenderer(frame_renderer=game_renderer)
+            video_renderer.render_many(sinks)
+
+        print("Done.")
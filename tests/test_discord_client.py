@@ -0,0 +1,153 @@
+
+"""Tests for the Discord HTTP client, against a stub server on
+localhost standing in for both the API and the CDN.
+
+"""
+
+from __future__ import annotations
+
+from blindman.discord.client import DiscordClient
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+
+# (status, headers, body)
+_Response = tuple[int, dict[str, str], bytes]
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # So that connections are kept alive
+    server: _StubServer
+
+    def do_GET(self) -> None:
+        status, headers, body = self.server.respond(self)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+class _StubServer(ThreadingHTTPServer):
+    """Serves the queued responses for each path in turn, and then the
+    default response for it, recording every request."""
+
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(('127.0.0.1', 0), _StubHandler)
+        self.lock = threading.Lock()
+        self.queued: dict[str, list[_Response]] = {}
+        self.defaults: dict[str, _Response] = {}
+        self.delay = 0.0
+        # (path, client port, time.monotonic() on arrival)
+        self.requests: list[tuple[str, int, float]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def respond(self, handler: _StubHandler) -> _Response:
+        with self.lock:
+            self.requests.append((handler.path, handler.client_address[1], time.monotonic()))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            queue = self.queued.get(handler.path)
+            response = queue.pop(0) if queue else self.defaults.get(handler.path, (404, {}, b''))
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+        return response
+
+    def paths(self) -> list[str]:
+        with self.lock:
+            return [path for path, _, _ in self.requests]
+
+
+def _json(status: int, data: object, headers: dict[str, str] | None = None) -> _Response:
+    return status, {'Content-Type': 'application/json', **(headers or {})}, json.dumps(data).encode('utf-8')
+
+
+class DiscordClientTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.server = _StubServer()
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        port = self.server.server_address[1]
+        # Different host names for the API and the CDN, as with Discord
+        self.client = DiscordClient(
+            api_base=f'http://127.0.0.1:{port}/api',
+            cdn_base=f'http://localhost:{port}/cdn',
+            max_concurrency=2,
+        )
+        self.addCleanup(self.client.close)
+        patcher = mock.patch.dict(os.environ, {'DISCORD_BOT_TOKEN': 'token'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_retries_after_429(self) -> None:
+        self.server.queued['/api/users/1'] = [_json(429, {'retry_after': 0.3, 'global': False})]
+        self.server.defaults['/api/users/1'] = _json(200, {'id': '1', 'avatar': 'abc'})
+        self.assertEqual(self.client.get_user_data('1'), {'id': '1', 'avatar': 'abc'})
+        (_, _, first), (_, _, second) = self.server.requests
+        self.assertGreaterEqual(second - first, 0.3)
+
+    def test_waits_for_exhausted_bucket(self) -> None:
+        headers = {'X-RateLimit-Bucket': 'users', 'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset-After': '0.3'}
+        self.server.queued['/api/users/1'] = [_json(200, {'id': '1', 'avatar': 'abc'}, headers)]
+        self.server.defaults['/api/users/2'] = _json(200, {'id': '2', 'avatar': 'def'})
+        self.client.get_user_data('1')
+        self.client.get_user_data('2')
+        (_, _, first), (_, _, second) = self.server.requests
+        self.assertGreaterEqual(second - first, 0.3)
+
+    def test_cdn_rate_limit_does_not_block_api(self) -> None:
+        avatar_path = '/cdn/avatars/1/abc.png'
+        self.server.queued[avatar_path] = [_json(429, {'retry_after': 1.0, 'global': True})]
+        self.server.defaults[avatar_path] = (200, {'Content-Type': 'image/png'}, b'png')
+        self.server.defaults['/api/users/2'] = _json(200, {'id': '2', 'avatar': 'def'})
+        avatar_thread = threading.Thread(target=self.client.get_avatar_image, args=('1', 'abc'))
+        avatar_thread.start()
+        while avatar_path not in self.server.paths():
+            time.sleep(0.01)
+        time.sleep(0.1)
+        start = time.monotonic()
+        self.client.get_user_data('2')
+        self.assertLess(time.monotonic() - start, 0.5)
+        avatar_thread.join()
+        self.assertEqual(self.server.paths(), [avatar_path, '/api/users/2', avatar_path])
+
+    def test_reuses_connection(self) -> None:
+        self.server.defaults['/api/users/1'] = _json(200, {'id': '1', 'avatar': 'abc'})
+        for _ in range(5):
+            self.client.get_user_data('1')
+        ports = {port for _, port, _ in self.server.requests}
+        self.assertEqual(len(ports), 1)
+
+    def test_get_avatars(self) -> None:
+        user_ids = [str(i) for i in range(6)]
+        for user_id in user_ids:
+            self.server.defaults[f'/api/users/{user_id}'] = _json(200, {'id': user_id, 'avatar': f'h{user_id}'})
+            self.server.defaults[f'/cdn/avatars/{user_id}/h{user_id}.png?size=64'] = (
+                200, {'Content-Type': 'image/png'}, f'png{user_id}'.encode('utf-8'),
+            )
+        self.server.delay = 0.05
+        avatars = self.client.get_avatars(user_ids, size=64)
+        self.assertEqual(avatars, {user_id: f'png{user_id}'.encode('utf-8') for user_id in user_ids})
+        self.assertEqual(len(self.server.requests), 2 * len(user_ids))
+        self.assertEqual(self.server.max_in_flight, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+
+"""Tests for follow mode, run through main.py.
+
+"""
+
+from __future__ import annotations
+
+import numpy as np
+from PIL import Image
+
+import os
+from pathlib import Path
+import subprocess
+import sys
+import tempfile
+import unittest
+
+MAIN = Path(__file__).resolve().parent.parent / 'main.py'
+
+GAME = """\
+(configuration :background-image "background.png" :fps 10 :start-space start)
+(spaces (start (20 20)) (shop (40 30)))
+(objects (object p1 "player.png" start))
+(commands
+  (move p1 shop)
+  (wait 30))
+"""
+
+
+class FollowTest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.dir = Path(temp_dir.name)
+        self.game_dir = self.dir / 'game'
+        self.game_dir.mkdir()
+        Image.fromarray(np.full((64, 64, 4), 255, np.uint8)).save(self.game_dir / 'background.png')
+        Image.fromarray(np.zeros((8, 8, 4), np.uint8) + 128).save(self.game_dir / 'player.png')
+        (self.game_dir / 'game.lisp').write_text(GAME, encoding='utf-8')
+
+    def test_relative_output_from_another_directory(self) -> None:
+        run_dir = self.dir / 'run'
+        run_dir.mkdir()
+        env = dict(os.environ, NO_REDIS='1', BLINDMAN_CACHE_DIR=str(self.dir / 'cache'))
+        subprocess.run(
+            [sys.executable, str(MAIN), '--follow', str(self.game_dir / 'game.lisp'), '-o', 'out.gif'],
+            cwd=run_dir, env=env, check=True, capture_output=True,
+        )
+        self.assertTrue((run_dir / 'out.gif').exists())
+        self.assertFalse((self.game_dir / 'out.gif').exists())
+
+
+if __name__ == '__main__':
+    unittest.main()